@@ -0,0 +1,73 @@
+"""
+Adaptive frame rate control for the real-time plotter.
+
+The controller is told how long each frame took to update and draw. It sets
+the animation interval so a share of every interval stays idle for the GUI
+event loop and the ingest threads, and shrinks the number of points drawn
+per frame while the target frame rate cannot be met, growing it back once
+frames are cheap again.
+"""
+
+# Weight of the newest measurement in the smoothed frame cost and rate
+SMOOTHING = 0.2
+
+
+class FrameRateController:
+    def __init__(self, target_fps=30, interval=20, headroom=0.25, max_interval=250,
+                 min_budget=500):
+        """
+        Initialize the controller.
+
+        Args:
+            target_fps (float): Frame rate to hold
+            interval (int): Initial animation interval in milliseconds
+            headroom (float): Share of every interval left idle
+            max_interval (int): Longest interval in milliseconds, so the
+                sample handoff is drained regularly however slow drawing is
+            min_budget (int): Fewest points the budget is lowered to
+        """
+        self.target_fps = target_fps
+        self.interval = interval
+        self.headroom = headroom
+        self.max_interval = max_interval
+        self.min_budget = min_budget
+
+        # Points to draw per frame, None for no limit
+        self.budget = None
+        # Smoothed seconds per frame spent updating and drawing, and frame rate
+        self.cost = None
+        self.fps = None
+
+    def add(self, cost, period, drawn):
+        """
+        Record one frame and adjust the interval and point budget.
+
+        Args:
+            cost (float): Seconds the frame took to update and draw
+            period (float): Seconds from the start of the frame to the start
+                of the next one
+            drawn (int): Points drawn in the frame
+        """
+        self.cost = cost if self.cost is None else self.cost + SMOOTHING * (cost - self.cost)
+        fps = 1 / period if period > 0 else 0.0
+        self.fps = fps if self.fps is None else self.fps + SMOOTHING * (fps - self.fps)
+
+        target = 1 / self.target_fps
+        needed = self.cost / (1 - self.headroom)
+        self.interval = int(round(min(max(target, needed), self.max_interval / 1000) * 1000))
+
+        if needed > target:
+            # Too slow for the target, draw fewer points
+            current = drawn if self.budget is None else min(self.budget, drawn)
+            self.budget = max(self.min_budget, int(current * 0.9))
+        elif self.budget is not None and needed < target / 2 and drawn * 2 >= self.budget:
+            # Plenty of time left and the budget may be what limits the detail
+            self.budget = int(self.budget * 1.1)
+
+    def summary(self):
+        """Format the measured frame rate, frame cost and point budget."""
+        if self.fps is None:
+            return f"target {self.target_fps:g} fps"
+        budget = 'all points' if self.budget is None else f"{self.budget} points"
+        return (f"{self.fps:.1f} fps (target {self.target_fps:g}), frame {self.cost * 1000:.1f} ms, "
+                f"interval {self.interval} ms, budget {budget}")
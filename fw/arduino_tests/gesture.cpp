@@ -45,6 +45,11 @@ void Gesture::tick() {
     // if (z > 0.5f) {
     //     printf("%ld, %f, %f, %f\n", position.timestamp, x, y, z);
     // }
+
+    // Optional: Raw channel deltas for the plotter's --format ascii-raw
+    // printf("%lu,%ld,%ld,%ld,%ld,%ld,%ld,%ld,%ld\n", position.timestamp,
+    //        position.readings[0], position.readings[1], position.readings[2], position.readings[3],
+    //        position.readings[4], position.readings[5], position.readings[6], position.readings[7]);
 }
 
 const char* gestureTypeStr(int type) {
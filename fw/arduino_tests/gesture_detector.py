@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Offline port of the firmware gesture detector (gestureDetector.cpp).
+
+Takes the same timestamp, x, y, z stream that the plotter reads, splits it
+into touches with the TOUCH_THRESHOLD / TOUCH_RELEASE_THRESHOLD hysteresis and
+classifies every stroke with the firmware's decision rules. Features (max
+distance, cumulative circle angle, radius variance, ...) are computed for all
+strokes of a recording at once with NumPy, so hours of captured data are
+processed in seconds. Thresholds are read straight from gestureConfig.h and
+can be overridden without reflashing.
+
+Usage:
+    python3 gesture_detector.py capture.bin
+    python3 gesture_detector.py capture.txt --set SWIPE_MIN_DISTANCE=0.5
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+CONFIG_HEADER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gestureConfig.h')
+
+# Same order as GestureType / Direction in gestureTypes.h, names as printed by gesture.cpp
+GESTURE_NAMES = ['NONE', 'TAP', 'HOLD', 'SWIPE_S', 'SWIPE_L', 'SWIPE_RET', 'CW_CIRCLE', 'CCW_CIRCLE']
+DIRECTION_NAMES = ['CENTER', 'N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+(GESTURE_NONE, GESTURE_TAP, GESTURE_HOLD, GESTURE_SWIPE_SHORT, GESTURE_SWIPE_LONG,
+ GESTURE_SWIPE_RETURN, GESTURE_CIRCLE_CW, GESTURE_CIRCLE_CCW) = range(len(GESTURE_NAMES))
+DIR_CENTER = 0
+
+# Direction for each 45 degree sector starting at east, counter-clockwise
+_SECTOR_DIRECTIONS = np.array([3, 2, 1, 8, 7, 6, 5, 4])
+
+# One row per detected gesture
+GESTURE_DTYPE = np.dtype([
+    ('start_index', np.int64),
+    ('release_index', np.int64),
+    ('start_time', np.float64),
+    ('duration_us', np.float64),
+    ('grid_position', np.int8),
+    ('type', np.int8),
+    ('direction', np.int8),
+    ('max_distance', np.float64),
+    ('max_distance_angle', np.float64),
+    ('swipe_detected', bool),
+    ('swipe_angle', np.float64),
+    ('return_distance', np.float64),
+    ('circle_points', np.int64),
+    ('circle_angle', np.float64),
+    ('radius_variance', np.float64),
+])
+
+_DEFINE = re.compile(r'^\s*#define\s+(\w+)\s+([-+]?[0-9.]+(?:[eE][-+]?\d+)?)f?\b')
+
+
+def load_config(path=CONFIG_HEADER):
+    """
+    Read the numeric #defines of gestureConfig.h.
+
+    Args:
+        path (str): Header to parse
+
+    Returns:
+        A dict mapping macro names (e.g. 'SWIPE_MIN_DISTANCE') to floats
+    """
+    config = {}
+    with open(path) as f:
+        for line in f:
+            match = _DEFINE.match(line)
+            if match:
+                config[match.group(1)] = float(match.group(2))
+    return config
+
+
+def segment_strokes(z, config):
+    """
+    Find touches using the firmware's IDLE / TRACKING / GESTURE_DETECTED states.
+
+    A touch starts on the first sample with z > TOUCH_THRESHOLD and is analyzed
+    on the first later sample with z < TOUCH_RELEASE_THRESHOLD (the release
+    sample). The detector then swallows samples until the next one below the
+    release threshold before it looks for a new touch. Touches still open at
+    the end of the data are not returned.
+
+    Args:
+        z (np.ndarray): Z values of the whole stream
+        config (dict): Gesture configuration
+
+    Returns:
+        Arrays (starts, releases) of sample indices, one entry per stroke
+    """
+    pressed = np.flatnonzero(z > config['TOUCH_THRESHOLD'])
+    released = np.flatnonzero(z < config['TOUCH_RELEASE_THRESHOLD'])
+
+    # One short step per stroke, not per sample
+    starts = []
+    releases = []
+    position = 0
+    while True:
+        i = np.searchsorted(pressed, position)
+        if i == len(pressed):
+            break
+        start = pressed[i]
+        j = np.searchsorted(released, start, side='right')
+        if j == len(released):
+            break
+        release = released[j]
+        starts.append(start)
+        releases.append(release)
+        if j + 1 == len(released):
+            break
+        # Back to IDLE on the next release-level sample, which itself can't
+        # start a touch
+        position = released[j + 1] + 1
+    return np.array(starts, dtype=np.int64), np.array(releases, dtype=np.int64)
+
+
+def grid_position(x, y, config):
+    """Grid cell (0-8, row major from the top left) for each x, y pair."""
+    half_width = config['GRID_CELL_WIDTH'] / 2
+    half_height = config['GRID_CELL_HEIGHT'] / 2
+    col = np.where(x < -half_width, 0, np.where(x > half_width, 2, 1))
+    row = np.where(y > half_height, 0, np.where(y < -half_height, 2, 1))
+    return col + row * int(config['GRID_COLS'])
+
+
+def direction_from_angle(angle_deg):
+    """Direction enum value for each angle (0 = east, counter-clockwise)."""
+    sector = np.floor(np.mod(np.asarray(angle_deg) + 22.5, 360) / 45).astype(int) % 8
+    return _SECTOR_DIRECTIONS[sector]
+
+
+def _angle_difference(a, b):
+    diff = a - b
+    diff = np.where(diff > 180, diff - 360, diff)
+    return np.where(diff < -180, diff + 360, diff)
+
+
+def stroke_features(timestamps, x, y, starts, releases, config):
+    """
+    Compute the detector state at release for every stroke at once.
+
+    All path points of all strokes are laid out in one flat array (stroke by
+    stroke) so every running quantity of the firmware becomes a segmented
+    NumPy reduction.
+
+    Args:
+        timestamps (np.ndarray): Sample timestamps in seconds
+        x, y (np.ndarray): Sample positions
+        starts, releases (np.ndarray): Stroke boundaries from segment_strokes
+        config (dict): Gesture configuration
+
+    Returns:
+        A GESTURE_DTYPE array with type and direction still unset
+    """
+    count = len(starts)
+    features = np.zeros(count, dtype=GESTURE_DTYPE)
+    features['start_index'] = starts
+    features['release_index'] = releases
+    features['start_time'] = timestamps[starts]
+    features['duration_us'] = (timestamps[releases] - timestamps[starts]) * 1e6
+    features['grid_position'] = grid_position(x[starts], y[starts], config)
+    if count == 0:
+        return features
+
+    # Path points are the start sample plus every tracking sample
+    lengths = releases - starts
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    stroke = np.repeat(np.arange(count), lengths)
+    rank = np.arange(offsets[-1]) - offsets[stroke]
+    index = starts[stroke] + rank
+    px = x[index]
+    py = y[index]
+
+    # Max distance from the start point and the angle where it was first reached
+    dx = px - x[starts][stroke]
+    dy = py - y[starts][stroke]
+    distance = np.hypot(dx, dy)
+    angle = np.degrees(np.arctan2(dy, dx))
+    max_distance = np.maximum.reduceat(distance, offsets[:-1])
+    at_max = np.flatnonzero(distance == max_distance[stroke])
+    first_max = at_max[np.unique(stroke[at_max], return_index=True)[1]]
+    features['max_distance'] = max_distance
+    features['max_distance_angle'] = np.where(max_distance > 0, angle[first_max], 0)
+
+    # Swipe-return tracking starts on the first point past the distance threshold
+    beyond = np.flatnonzero(distance > config['SWIPE_RETURN_MIN_DISTANCE'])
+    beyond_strokes, first_beyond = np.unique(stroke[beyond], return_index=True)
+    features['swipe_detected'][beyond_strokes] = True
+    features['swipe_angle'][beyond_strokes] = angle[beyond[first_beyond]]
+    features['return_distance'] = np.hypot(x[releases] - x[starts], y[releases] - y[starts])
+
+    # Circle center is the mean of the last PATH_HISTORY_SIZE points, updated
+    # from the third path point on
+    history = int(config['PATH_HISTORY_SIZE'])
+    window_start = offsets[stroke] + np.maximum(rank - history + 1, 0)
+    # (relative to the start point, to keep the running sums small)
+    cum_x = np.concatenate(([0], np.cumsum(dx)))
+    cum_y = np.concatenate(([0], np.cumsum(dy)))
+    flat = np.arange(len(px))
+    window = flat - window_start + 1
+    center_x = (cum_x[flat + 1] - cum_x[window_start]) / window
+    center_y = (cum_y[flat + 1] - cum_y[window_start]) / window
+    circle_angle = np.degrees(np.arctan2(dy - center_y, dx - center_x))
+
+    tracked = rank >= 2
+    features['circle_points'] = np.maximum(lengths - 2, 0)
+    accumulate = np.flatnonzero(rank >= 3)
+    delta = _angle_difference(circle_angle[accumulate], circle_angle[accumulate - 1])
+    features['circle_angle'] = np.bincount(stroke[accumulate], weights=delta, minlength=count)
+
+    # Radius variance around the final center, over the final path history
+    last = offsets[1:] - 1
+    in_history = rank >= lengths[stroke] - history
+    radius = np.hypot(dx - center_x[last][stroke], dy - center_y[last][stroke])
+    history_size = np.minimum(lengths, history)
+    avg_radius = np.bincount(stroke, weights=radius * in_history, minlength=count) / history_size
+    spread = np.abs(radius - avg_radius[stroke]) * in_history
+    variance = np.bincount(stroke, weights=spread, minlength=count) / history_size
+    features['radius_variance'] = np.where(tracked[last], variance, np.inf)
+    return features
+
+
+def classify_strokes(features, config):
+    """
+    Apply the firmware's decision rules to precomputed stroke features.
+
+    Priority order matches GestureDetector::analyzeGesture: swipe-return,
+    circle, long swipe, hold, short swipe, tap.
+
+    Args:
+        features (np.ndarray): GESTURE_DTYPE array from stroke_features
+        config (dict): Gesture configuration
+
+    Returns:
+        Arrays (type, direction) of enum values
+    """
+    max_distance = features['max_distance']
+    duration = features['duration_us']
+
+    swipe_return = (
+        features['swipe_detected']
+        & (max_distance >= config['SWIPE_RETURN_MIN_DISTANCE'])
+        & (features['return_distance'] < max_distance * 0.5)
+    )
+    circle = (
+        (features['circle_points'] >= config['CIRCLE_MIN_POINTS'])
+        & (np.abs(features['circle_angle']) >= config['CIRCLE_MIN_ARC_ANGLE'])
+        & (features['radius_variance'] < config['CIRCLE_MAX_RADIUS_VARIANCE'])
+    )
+    long_swipe = max_distance >= config['LONG_SWIPE_DISTANCE']
+    still = max_distance < config['SWIPE_MIN_DISTANCE']
+    hold = still & (duration >= config['HOLD_MIN_DURATION'])
+    swipe = ~still & ~long_swipe
+    tap = still & (duration < config['HOLD_MIN_DURATION'])
+
+    circle_type = np.where(features['circle_angle'] < 0, GESTURE_CIRCLE_CW, GESTURE_CIRCLE_CCW)
+    gesture = np.select(
+        [swipe_return, circle, long_swipe, hold, swipe, tap],
+        [GESTURE_SWIPE_RETURN, circle_type, GESTURE_SWIPE_LONG, GESTURE_HOLD,
+         GESTURE_SWIPE_SHORT, GESTURE_TAP],
+        default=GESTURE_NONE,
+    )
+    direction = np.select(
+        [swipe_return, circle, long_swipe | swipe],
+        [direction_from_angle(features['swipe_angle']), DIR_CENTER,
+         direction_from_angle(features['max_distance_angle'])],
+        default=DIR_CENTER,
+    )
+    return gesture, direction
+
+
+def detect_gestures(timestamps, x, y, z, config=None):
+    """
+    Segment and classify every stroke in a stream.
+
+    Args:
+        timestamps (np.ndarray): Sample timestamps in seconds
+        x, y, z (np.ndarray): Sample values
+        config (dict): Gesture configuration, gestureConfig.h if None
+
+    Returns:
+        A GESTURE_DTYPE array with one row per detected gesture
+    """
+    if config is None:
+        config = load_config()
+    timestamps, x, y, z = (np.asarray(v, dtype=float) for v in (timestamps, x, y, z))
+    starts, releases = segment_strokes(z, config)
+    features = stroke_features(timestamps, x, y, starts, releases, config)
+    features['type'], features['direction'] = classify_strokes(features, config)
+    return features
+
+
+def load_samples(path, device=None):
+    """
+    Load a capture made with ploting_test.py --record, or a text log.
+
+    Args:
+        path (str): Recording or "timestamp,x,y,z" text file
+        device (int): Device to load from a multi-device recording, see
+            touch_record.open_recording()
+
+    Returns:
+        A tuple (timestamps_s, x, y, z) of arrays
+    """
+    from touch_record import RECORD_MAGIC, open_recording
+    from touch_stream import AsciiDecoder
+
+    with open(path, 'rb') as f:
+        is_recording = f.read(len(RECORD_MAGIC)) == RECORD_MAGIC
+    if is_recording:
+        records = open_recording(path, device)
+        return records['timestamp'], records['x'], records['y'], records['z']
+    if device not in (None, 0):
+        raise ValueError(f"{path} is a text log of a single device, it has no device {device}")
+
+    decoder = AsciiDecoder()
+    batches = []
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 22), b''):
+            batches.append(decoder.feed(chunk))
+    batches.append(decoder.feed(b'\n'))
+    return tuple(np.concatenate(column) for column in zip(*batches))
+
+
+def format_gesture(gesture):
+    """Format a gesture row like the firmware's printGesture()."""
+    return (
+        f"Gesture detected: type={GESTURE_NAMES[gesture['type']]} ({gesture['type']}), "
+        f"dir={DIRECTION_NAMES[gesture['direction']]} ({gesture['direction']}), "
+        f"pos={gesture['grid_position']}"
+    )
+
+
+def parse_overrides(overrides):
+    """Turn ["NAME=value", ...] into a dict of floats."""
+    config = {}
+    for override in overrides:
+        name, _, value = override.partition('=')
+        config[name.strip()] = float(value)
+    return config
+
+
+def main():
+    """Classify all gestures in a capture and print a summary."""
+    parser = argparse.ArgumentParser(description='Offline gesture classification of touch captures')
+    parser.add_argument('capture', help='Recording (--record) or timestamp,x,y,z text file')
+    parser.add_argument('--config', default=CONFIG_HEADER,
+                        help='Gesture config header (default: gestureConfig.h)')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='Override a config value, can be repeated')
+    parser.add_argument('--list', action='store_true', help='Print every gesture')
+    parser.add_argument('--device', type=int,
+                        help='Device to classify from a multi-device recording (--ports --record)')
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    config.update(parse_overrides(args.set))
+
+    start = time.perf_counter()
+    try:
+        samples = load_samples(args.capture, args.device)
+    except ValueError as e:
+        parser.error(str(e))
+    loaded = time.perf_counter()
+    gestures = detect_gestures(*samples, config=config)
+    done = time.perf_counter()
+
+    if args.list:
+        for gesture in gestures:
+            print(f"{gesture['start_time']:12.6f}  {format_gesture(gesture)}")
+
+    print(f"{len(samples[0])} samples, {len(gestures)} gestures "
+          f"(load {loaded - start:.2f}s, classify {done - loaded:.2f}s)")
+    types, counts = np.unique(gestures['type'], return_counts=True)
+    for gesture_type, count in zip(types, counts):
+        print(f"  {GESTURE_NAMES[gesture_type]:<12}{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Parallel threshold sweep of the gesture detector over labelled captures.
+
+Every combination of the swept gestureConfig.h values is run through the
+offline detector (gesture_detector.py) on all captures and scored against
+hand-made labels. Combinations are spread over a ProcessPoolExecutor; the
+decoded capture data is placed in one shared memory block that the workers
+map instead of receiving a pickled copy per task.
+
+Labels live next to each capture in <capture>.labels, one gesture per line:
+
+    # time_s,gesture
+    12.345,TAP
+    14.020,SWIPE_L
+
+The time can be any moment during the touch. A labelled touch that is not
+detected counts as NONE, a detected touch without a label counts as a
+false positive in the NONE row of the confusion matrix.
+
+Usage:
+    python3 gesture_sweep.py a.bin b.bin --sweep SWIPE_MIN_DISTANCE=0.3:0.6:0.05 \\
+        --sweep HOLD_MIN_DURATION=150000,200000,250000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from gesture_detector import (CONFIG_HEADER, GESTURE_NAMES, classify_strokes, load_config,
+                              load_samples, parse_overrides, segment_strokes, stroke_features)
+
+# Config values that change the stroke features rather than only the final
+# decision; features are cached per distinct combination of these
+FEATURE_PARAMETERS = (
+    'TOUCH_THRESHOLD', 'TOUCH_RELEASE_THRESHOLD', 'SWIPE_RETURN_MIN_DISTANCE',
+    'PATH_HISTORY_SIZE', 'GRID_COLS', 'GRID_CELL_WIDTH', 'GRID_CELL_HEIGHT',
+)
+
+# Worker state, set up once per process by _init_worker
+_shm = None
+_captures = None
+_feature_cache = {}
+
+
+def load_labels(path):
+    """
+    Read a labels file.
+
+    Args:
+        path (str): File with "time_s,gesture" lines
+
+    Returns:
+        Arrays (times, types) sorted by time, types as GestureType values
+    """
+    times = []
+    types = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            time_s, _, name = line.partition(',')
+            name = name.strip().upper()
+            if name not in GESTURE_NAMES:
+                raise ValueError(f"{path}:{number}: unknown gesture '{name}'")
+            times.append(float(time_s))
+            types.append(GESTURE_NAMES.index(name))
+    order = np.argsort(times)
+    return np.array(times)[order], np.array(types, dtype=np.int64)[order]
+
+
+def parse_sweep(spec):
+    """
+    Parse a --sweep argument.
+
+    Args:
+        spec (str): "NAME=start:stop:step" (stop inclusive) or "NAME=v1,v2,..."
+
+    Returns:
+        A tuple (name, values)
+    """
+    name, _, values = spec.partition('=')
+    if not values:
+        raise ValueError(f"Invalid sweep '{spec}', expected NAME=start:stop:step or NAME=v1,v2")
+    if ':' in values:
+        start, stop, step = (float(v) for v in values.split(':'))
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return name.strip(), [round(start + i * step, 10) for i in range(count)]
+    return name.strip(), [float(v) for v in values.split(',')]
+
+
+def score(gestures, timestamps, label_times, label_types):
+    """
+    Confusion matrix of detected gestures against labels.
+
+    Args:
+        gestures (np.ndarray): GESTURE_DTYPE array from the detector
+        timestamps (np.ndarray): Sample timestamps of the capture
+        label_times, label_types (np.ndarray): Labels from load_labels
+
+    Returns:
+        A (len(GESTURE_NAMES), len(GESTURE_NAMES)) int array indexed by
+        [labelled type, detected type]
+    """
+    size = len(GESTURE_NAMES)
+    if len(gestures) == 0:
+        # Nothing detected, every label was missed
+        return np.bincount(label_types * size, minlength=size * size).reshape(size, size)
+    start_times = timestamps[gestures['start_index']]
+    release_times = timestamps[gestures['release_index']]
+
+    # Each label belongs to the touch that was active at its time
+    stroke = np.searchsorted(start_times, label_times, side='right') - 1
+    hit = stroke >= 0
+    hit[hit] = label_times[hit] <= release_times[stroke[hit]]
+    detected = np.where(hit, gestures['type'][np.maximum(stroke, 0)], 0)
+
+    labelled = np.zeros(len(gestures), dtype=bool)
+    labelled[stroke[hit]] = True
+    unlabelled = gestures['type'][~labelled]
+
+    pairs = np.concatenate((label_types * size + detected, unlabelled.astype(np.int64)))
+    return np.bincount(pairs, minlength=size * size).reshape(size, size)
+
+
+def accuracy(confusion):
+    """Fraction of labels and false positives that were classified correctly."""
+    total = confusion.sum()
+    correct = np.trace(confusion) - confusion[0, 0]
+    return correct / total if total else 0.0
+
+
+def _init_worker(shm_name, shape, captures):
+    global _captures, _shm
+    # Keep a reference to the block so the mapping outlives this function
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf)
+    _captures = [
+        (data[:, start:end], label_times, label_types)
+        for start, end, label_times, label_types in captures
+    ]
+
+
+def _evaluate(configs):
+    results = []
+    for config in configs:
+        key = tuple(config[name] for name in FEATURE_PARAMETERS)
+        confusion = np.zeros((len(GESTURE_NAMES), len(GESTURE_NAMES)), dtype=np.int64)
+        for index, (data, label_times, label_types) in enumerate(_captures):
+            timestamps, x, y, z = data
+            features = _feature_cache.get((index, key))
+            if features is None:
+                starts, releases = segment_strokes(z, config)
+                features = stroke_features(timestamps, x, y, starts, releases, config)
+                _feature_cache[index, key] = features
+            gestures = features.copy()
+            gestures['type'], gestures['direction'] = classify_strokes(features, config)
+            confusion = confusion + score(gestures, timestamps, label_times, label_types)
+        results.append(confusion)
+    return results
+
+
+def run_sweep(captures, base_config, sweeps, jobs=None, chunk_size=None):
+    """
+    Evaluate every combination of the swept values.
+
+    Args:
+        captures (list): (timestamps, x, y, z, label_times, label_types) tuples
+        base_config (dict): Values for everything that is not swept
+        sweeps (list): (name, values) pairs from parse_sweep
+        jobs (int): Worker processes, os.cpu_count() if None
+        chunk_size (int): Configurations per task, chosen automatically if None
+
+    Returns:
+        A list of (config, confusion) tuples in sweep order
+    """
+    names = [name for name, _ in sweeps]
+    configs = [
+        {**base_config, **dict(zip(names, values))}
+        for values in itertools.product(*(values for _, values in sweeps))
+    ]
+    jobs = jobs or os.cpu_count()
+
+    # Sort so configurations sharing stroke features land in the same task
+    # and hit the worker's feature cache
+    order = sorted(range(len(configs)),
+                   key=lambda i: tuple(configs[i][name] for name in FEATURE_PARAMETERS))
+    if chunk_size is None:
+        chunk_size = max(1, len(configs) // (jobs * 4))
+    chunks = [[configs[i] for i in order[k:k + chunk_size]]
+              for k in range(0, len(order), chunk_size)]
+
+    lengths = [len(capture[0]) for capture in captures]
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    shape = (4, int(bounds[-1]))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * shape[0] * shape[1]))
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        meta = []
+        for capture, start, end in zip(captures, bounds[:-1], bounds[1:]):
+            data[:, start:end] = capture[:4]
+            meta.append((int(start), int(end), capture[4], capture[5]))
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(shm.name, shape, meta)) as executor:
+            confusions = [c for result in executor.map(_evaluate, chunks) for c in result]
+        del data
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = [None] * len(configs)
+    for position, confusion in zip(order, confusions):
+        results[position] = (configs[position], confusion)
+    return results
+
+
+def format_confusion(confusion):
+    """Render a confusion matrix with labelled types as rows."""
+    used = np.flatnonzero(confusion.sum(axis=0) + confusion.sum(axis=1))
+    width = max((len(GESTURE_NAMES[i]) for i in used), default=0) + 2
+    lines = ['label \\ detected'.ljust(width) + ''.join(GESTURE_NAMES[i].rjust(width) for i in used)]
+    for row in used:
+        lines.append(GESTURE_NAMES[row].ljust(width)
+                     + ''.join(str(confusion[row, col]).rjust(width) for col in used))
+    return '\n'.join(lines)
+
+
+def main():
+    """Run a threshold sweep from the command line."""
+    parser = argparse.ArgumentParser(description='Sweep gesture thresholds over labelled captures')
+    parser.add_argument('captures', nargs='+', help='Recordings or text logs with a .labels file each')
+    parser.add_argument('--sweep', action='append', default=[], metavar='NAME=RANGE',
+                        help='Swept value, NAME=start:stop:step or NAME=v1,v2,... (repeatable)')
+    parser.add_argument('--config', default=CONFIG_HEADER,
+                        help='Gesture config header (default: gestureConfig.h)')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='Override a fixed config value, can be repeated')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--top', type=int, default=10, help='Number of configurations to list')
+    parser.add_argument('--json', metavar='FILE', help='Write all results to a JSON file')
+
+    args = parser.parse_args()
+
+    base_config = load_config(args.config)
+    base_config.update(parse_overrides(args.set))
+    sweeps = [parse_sweep(spec) for spec in args.sweep]
+    for name, _ in sweeps:
+        if name not in base_config:
+            parser.error(f"Unknown config value '{name}'")
+
+    captures = []
+    for path in args.captures:
+        timestamps, x, y, z = load_samples(path)
+        label_times, label_types = load_labels(path + '.labels')
+        captures.append((timestamps, x, y, z, label_times, label_types))
+        print(f"{path}: {len(timestamps)} samples, {len(label_times)} labels")
+
+    start = time.perf_counter()
+    results = run_sweep(captures, base_config, sweeps, jobs=args.jobs)
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {len(results)} configurations in {elapsed:.2f}s")
+
+    names = [name for name, _ in sweeps]
+    ranked = sorted(results, key=lambda result: accuracy(result[1]), reverse=True)
+    for config, confusion in ranked[:args.top]:
+        values = ', '.join(f"{name}={config[name]:g}" for name in names)
+        print(f"  {accuracy(confusion):6.1%}  {values}")
+
+    if ranked:
+        print("\nConfusion matrix of the best configuration:")
+        print(format_confusion(ranked[0][1]))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([
+                {
+                    'config': {name: config[name] for name in names},
+                    'accuracy': accuracy(confusion),
+                    'confusion': confusion.tolist(),
+                }
+                for config, confusion in results
+            ], f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Rolling latency statistics for the real-time plotter.
+
+Each tracker keeps the most recent measurements in a fixed-size ring so
+percentiles reflect current behaviour rather than the whole session.
+"""
+
+import numpy as np
+
+
+class LatencyTracker:
+    def __init__(self, window=1000):
+        """
+        Initialize the tracker.
+
+        Args:
+            window (int): Number of most recent measurements kept
+        """
+        self.window = window
+        self._values = np.zeros(window)
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.window)
+
+    def add(self, seconds):
+        """Record one latency measurement in seconds."""
+        self._values[self._count % self.window] = seconds
+        self._count += 1
+
+    def values(self):
+        """Return the measurements in the window, in no particular order."""
+        return self._values[:len(self)]
+
+    def percentiles(self, q=(50, 95, 99)):
+        """Return the given percentiles in seconds, NaN while empty."""
+        if not len(self):
+            return np.full(len(q), np.nan)
+        return np.percentile(self.values(), q)
+
+    def histogram(self, bins=20):
+        """Return (counts, bin_edges) of the measurements, see np.histogram."""
+        return np.histogram(self.values(), bins=bins)
+
+    def summary(self):
+        """Format p50/p95/p99 in milliseconds."""
+        if not len(self):
+            return "no data"
+        p50, p95, p99 = self.percentiles() * 1000
+        return f"p50 {p50:6.1f}  p95 {p95:6.1f}  p99 {p99:6.1f} ms  (n={len(self)})"
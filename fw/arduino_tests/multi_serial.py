@@ -0,0 +1,181 @@
+"""
+Read several touchpads in one process.
+
+One asyncio event loop, running on a background thread, serves every port.
+On POSIX the port file descriptors are registered with the loop and read
+without blocking whenever data is available, so idle boards cost nothing
+and N boards need one thread instead of N processes. Where the loop cannot
+watch serial handles (e.g. Windows), each port is polled by a coroutine.
+
+Each port gets its own decoder and SampleHandoff; the handoff's position in
+the port list is the device index samples are tagged with.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from sample_handoff import SampleHandoff, stamp_events
+from touch_stream import make_decoder
+
+# Largest chunk taken from a port per readiness callback
+READ_SIZE = 65536
+
+
+class MultiSerialSource:
+    def __init__(self, ports, baudrate=115200, stream_format='ascii', handoffs=None,
+                 poll_interval=0.005):
+        """
+        Prepare the ports; nothing is opened until start().
+
+        Args:
+            ports (list): Serial ports to read, in device index order
+            baudrate (int): Baud rate for all ports
+            stream_format (str): Serial wire format, 'ascii', 'binary', 'ascii-raw' or
+                'binary-raw' (see touch_stream.make_decoder)
+            handoffs (list): One SampleHandoff per port to deliver to, new
+                ones are created if None
+            poll_interval (float): Seconds between reads of ports that have
+                to be polled
+        """
+        self.ports = list(ports)
+        self.baudrate = baudrate
+        self.handoffs = handoffs if handoffs is not None else [SampleHandoff() for _ in self.ports]
+        if len(self.handoffs) != len(self.ports):
+            raise ValueError("Need one handoff per port")
+        self.decoders = [make_decoder(stream_format) for _ in self.ports]
+        self.poll_interval = poll_interval
+
+        # Per device counters, only written by the loop thread
+        self.bytes = [0] * len(self.ports)
+        self.read_errors = [0] * len(self.ports)
+
+        self._connections = []
+        self._last_sample_received = [None] * len(self.ports)
+        self._loop = None
+        self._stopped = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='multi-serial', daemon=True)
+
+    def start(self):
+        """
+        Open every port and start the event loop thread.
+
+        Returns:
+            True if all ports could be opened
+        """
+        import serial
+
+        for port in self.ports:
+            try:
+                # timeout=0 makes reads return whatever is buffered at once
+                self._connections.append(serial.Serial(port=port, baudrate=self.baudrate, timeout=0))
+            except serial.SerialException as e:
+                print(f"Failed to connect to {port}: {e}")
+                self._close_connections()
+                return False
+            print(f"Connected to {port} at {self.baudrate} baud")
+        self._thread.start()
+        self._ready.wait(5.0)
+        return True
+
+    def stop(self, timeout=2.0):
+        """Stop the event loop and close all ports."""
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join(timeout)
+        self._close_connections()
+
+    def stats(self):
+        """Return one dict of ingest counters per device."""
+        return [
+            {
+                'port': port,
+                'bytes': self.bytes[device],
+                'received': self.handoffs[device].received,
+                'dropped': self.handoffs[device].dropped,
+                'parse_errors': self.decoders[device].malformed,
+                'read_errors': self.read_errors[device],
+            }
+            for device, port in enumerate(self.ports)
+        ]
+
+    def _close_connections(self):
+        for conn in self._connections:
+            if conn.is_open:
+                conn.close()
+        self._connections = []
+
+    def _run(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        watched = []
+        polling = []
+        for device, conn in enumerate(self._connections):
+            try:
+                self._loop.add_reader(conn.fileno(), self._on_readable, device)
+                watched.append(conn.fileno())
+            except (NotImplementedError, AttributeError, ValueError):
+                polling.append(asyncio.create_task(self._poll(device)))
+        self._ready.set()
+
+        try:
+            await self._stopped.wait()
+        finally:
+            for fd in watched:
+                self._loop.remove_reader(fd)
+            for task in polling:
+                task.cancel()
+
+    def _on_readable(self, device):
+        fd = self._connections[device].fileno()
+        try:
+            data = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.read_errors[device] += 1
+            print(f"Error reading {self.ports[device]}: {e}")
+            self._loop.remove_reader(fd)
+            return
+        if not data:
+            # End of file, the board went away
+            self._loop.remove_reader(fd)
+            return
+        self._deliver(device, data)
+
+    async def _poll(self, device):
+        conn = self._connections[device]
+        while True:
+            try:
+                data = conn.read(conn.in_waiting or 1)
+            except Exception as e:
+                self.read_errors[device] += 1
+                print(f"Error reading {self.ports[device]}: {e}")
+                if not conn.is_open:
+                    return
+                data = b''
+            if data:
+                self._deliver(device, data)
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    def _deliver(self, device, data):
+        received = time.perf_counter()
+        self.bytes[device] += len(data)
+        decoder = self.decoders[device]
+        handoff = self.handoffs[device]
+
+        timestamps, x, y, z = decoder.feed(data)
+        handoff.push(timestamps, x, y, z)
+
+        previous_received = self._last_sample_received[device]
+        if len(timestamps):
+            self._last_sample_received[device] = received
+        for event in stamp_events(decoder.pop_events(), timestamps, received, previous_received):
+            handoff.push_event(event)
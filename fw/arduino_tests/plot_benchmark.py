@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the plotter's ingest and render paths.
+
+Drives the real RealtimePlotter code with simulated gestures (see
+touch_simulator) on the Agg backend, so no display is needed, and reports
+samples per second for the ingest steps, frame times for update_plot plus
+drawing, and the peak memory allocated by each step. Results are written as
+JSON so runs on different commits can be compared:
+
+    python3 plot_benchmark.py --output before.json
+    git checkout other-branch
+    python3 plot_benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+import ploting_test
+from sample_buffer import SampleBuffer
+from touch_pipeline import DecodeStage
+from touch_simulator import TouchSimulator, random_script
+from touch_stream import AsciiDecoder, BinaryDecoder, encode_frames
+
+
+def simulated_samples(count, rate, seed=0):
+    """Return (timestamps, x, y, z) of count simulated samples at rate Hz."""
+    simulator = TouchSimulator(random_script(50, np.random.default_rng(seed)), rate=rate, seed=seed)
+    timestamps, x, y, z, _, _ = simulator.generate(duration=count / rate)
+    return timestamps, x, y, z
+
+
+def measure(run, repeat=3):
+    """
+    Time a benchmark and measure its peak allocations.
+
+    Args:
+        run (callable): Function doing one round of work; it returns the
+            number of units processed (samples or frames)
+        repeat (int): Timed rounds, the fastest one is reported
+
+    Returns:
+        A tuple (units, best_seconds, peak_bytes)
+    """
+    best = float('inf')
+    units = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        units = run()
+        best = min(best, time.perf_counter() - start)
+
+    # A separate round for memory, tracemalloc slows everything down
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return units, best, peak
+
+
+def make_plotter(view, max_points, time_window, lod=True):
+    plotter = ploting_test.RealtimePlotter(max_points=max_points, time_window=time_window, view=view,
+                                           lod=lod)
+    plotter.fig.canvas.draw()
+    return plotter
+
+
+def bench_parsing(count, rate):
+    """The pipeline's decode stage and the two stream decoders."""
+    timestamps, x, y, z = simulated_samples(count, rate)
+    timestamps_us = np.round(timestamps * 1e6).astype(np.int64)
+    lines = [f"{t},{a:.5f},{b:.5f},{c:.5f}\n" for t, a, b, c in zip(timestamps_us, x, y, z)]
+    text = ''.join(lines).encode('ascii')
+    frames = encode_frames(timestamps_us, x, y, z)
+
+    def decode_stage():
+        stage = DecodeStage(AsciiDecoder())
+        for start in range(0, len(text), 4096):
+            stage.process((text[start:start + 4096], time.perf_counter()))
+        return stage.decoder.samples
+
+    def feed(decoder_class, data):
+        def run():
+            decoder = decoder_class()
+            # Serial-sized chunks
+            for start in range(0, len(data), 4096):
+                decoder.feed(data[start:start + 4096])
+            return decoder.samples
+        return run
+
+    params = {'samples': count}
+    yield 'decode_stage', params, 'samples', measure(decode_stage)
+    yield 'ascii_decoder', params, 'samples', measure(feed(AsciiDecoder, text))
+    yield 'binary_decoder', params, 'samples', measure(feed(BinaryDecoder, frames))
+
+
+def bench_ingest(max_points, rate, time_window, seconds):
+    """Per-sample and batched insertion into the sample buffer."""
+    count = int(rate * seconds)
+    timestamps, x, y, z = simulated_samples(count, rate)
+    plotter = make_plotter('2d', max_points, time_window)
+
+    def per_sample():
+        plotter.buffer = SampleBuffer(capacity=max_points, time_window=time_window)
+        for sample in zip(timestamps, x, y, z):
+            plotter.add_data_point(*sample)
+            plotter.cleanup_old_data(sample[0])
+        return count
+
+    def batched():
+        buffer = SampleBuffer(capacity=max_points, time_window=time_window)
+        # 10 ms batches, as the serial reader delivers them
+        step = max(1, int(rate // 100))
+        for start in range(0, count, step):
+            end = start + step
+            buffer.extend(timestamps[start:end], x[start:end], y[start:end], z[start:end])
+        return count
+
+    params = {'max_points': max_points, 'rate': rate, 'time_window': time_window}
+    yield 'add_data_point', params, 'samples', measure(per_sample)
+    yield 'buffer_extend', params, 'samples', measure(batched)
+    plt.close(plotter.fig)
+
+
+def bench_render(view, max_points, rate, time_window, frames, lod=True):
+    """plot_connected_lines and full animation frames on a filled buffer."""
+    plotter = make_plotter(view, max_points, time_window, lod)
+    interval = plotter.update_interval / 1000
+    per_frame = max(1, int(rate * interval))
+    warmup = min(max_points, int(rate * time_window))
+    timestamps, x, y, z = simulated_samples(warmup + per_frame * (frames + 1) * 4, rate)
+    plotter.buffer.extend(timestamps[:warmup], x[:warmup], y[:warmup], z[:warmup])
+    position = [warmup]
+
+    canvas = plotter.fig.canvas
+    canvas.draw()
+    background = canvas.copy_from_bbox(plotter.fig.bbox)
+
+    def connected_lines():
+        buffer = plotter.buffer
+        z = buffer.z if view == '3d' else None
+        for _ in range(frames):
+            plotter.plot_connected_lines(buffer.timestamps, buffer.x, buffer.y, z)
+        return frames
+
+    def animate():
+        for _ in range(frames):
+            start = position[0]
+            end = start + per_frame
+            if end > len(timestamps):
+                start, end = warmup, warmup + per_frame
+            plotter.handoff.push(timestamps[start:end], x[start:end], y[start:end], z[start:end])
+            position[0] = end
+
+            artists = plotter.update_plot(0)
+            if view == '2d':
+                # What FuncAnimation does when blitting
+                canvas.restore_region(background)
+                for artist in artists:
+                    plotter.ax.draw_artist(artist)
+                canvas.blit(plotter.fig.bbox)
+            else:
+                canvas.draw()
+        return frames
+
+    params = {'view': view, 'max_points': max_points, 'rate': rate, 'time_window': time_window,
+              'points': len(plotter.buffer)}
+    yield 'plot_connected_lines', params, 'frames', measure(connected_lines)
+    yield 'update_plot', params, 'frames', measure(animate)
+    plt.close(plotter.fig)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def format_result(result):
+    params = ', '.join(f"{k}={v}" for k, v in result['params'].items())
+    if result['unit'] == 'frames':
+        value = f"{result['ms_per_frame']:9.2f} ms/frame"
+    else:
+        value = f"{result['per_second']:12.0f} samples/s"
+    return f"{result['name']:<22}{value}  peak {result['peak_kib']:9.0f} KiB  ({params})"
+
+
+def main():
+    """Run the benchmarks and write the results as JSON."""
+    parser = argparse.ArgumentParser(description='Benchmark the real-time plotter')
+    parser.add_argument('--max-points', default='1000,10000',
+                        help='Comma separated buffer sizes (default: 1000,10000)')
+    parser.add_argument('--rates', default='1000,10000',
+                        help='Comma separated sample rates in Hz (default: 1000,10000)')
+    parser.add_argument('--time-windows', default='10',
+                        help='Comma separated time windows in seconds (default: 10)')
+    parser.add_argument('--views', default='3d,2d', help='Comma separated views (default: 3d,2d)')
+    parser.add_argument('--frames', type=int, default=20, help='Frames per render benchmark (default: 20)')
+    parser.add_argument('--parse-samples', type=int, default=20000,
+                        help='Samples for the parsing benchmarks (default: 20000)')
+    parser.add_argument('--ingest-seconds', type=float, default=2.0,
+                        help='Simulated seconds for the ingest benchmarks (default: 2)')
+    parser.add_argument('--no-lod', action='store_true',
+                        help='Render every sample, e.g. to --compare against the decimated view')
+    parser.add_argument('--output', default='benchmark.json', help='JSON results file (default: benchmark.json)')
+    parser.add_argument('--compare', metavar='FILE', help='Earlier results to compare against')
+
+    args = parser.parse_args()
+
+    max_points = [int(v) for v in args.max_points.split(',')]
+    rates = [float(v) for v in args.rates.split(',')]
+    time_windows = [float(v) for v in args.time_windows.split(',')]
+    views = args.views.split(',')
+
+    benchmarks = [bench_parsing(args.parse_samples, rates[0])]
+    for points in max_points:
+        for rate in rates:
+            for window in time_windows:
+                benchmarks.append(bench_ingest(points, rate, window, args.ingest_seconds))
+                for view in views:
+                    benchmarks.append(bench_render(view, points, rate, window, args.frames,
+                                                   lod=not args.no_lod))
+
+    results = []
+    for benchmark in benchmarks:
+        for name, params, unit, (units, seconds, peak) in benchmark:
+            result = {'name': name, 'params': params, 'unit': unit, 'seconds': seconds,
+                      'count': units, 'peak_kib': peak / 1024}
+            if unit == 'frames':
+                result['ms_per_frame'] = seconds / units * 1000
+            else:
+                result['per_second'] = units / seconds
+            results.append(result)
+            print(format_result(result))
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'matplotlib': matplotlib.__version__,
+            'machine': platform.platform(),
+            'lod': not args.no_lod,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        previous = {result_key(result): result for result in baseline['results']}
+        print(f"\nCompared to {args.compare} (revision {baseline['meta'].get('revision')}), "
+              f"ratio > 1 is faster:")
+        for result in results:
+            old = previous.get(result_key(result))
+            if old is None:
+                continue
+            ratio = old['seconds'] / old['count'] / (result['seconds'] / result['count'])
+            print(f"  {ratio:6.2f}x  {format_result(result)}")
+
+
+if __name__ == "__main__":
+    main()
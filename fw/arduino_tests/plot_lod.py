@@ -0,0 +1,85 @@
+"""
+Level-of-detail reduction for drawing long touch trajectories.
+
+The plotter keeps every sample, but drawing more vertices than the axes have
+pixels only costs time. decimate() picks the samples worth drawing:
+
+* consecutive samples that stay within one pixel are merged, keeping the
+  first and last sample of each run so lines still join up
+* if that leaves more than the point budget, equal runs of the remaining
+  samples are reduced to their first sample and their min/max along every
+  axis, which preserves the outline of the trajectory
+* the most recent samples are always drawn at full resolution, as long as
+  they take up no more than half of the budget
+
+Samples on either side of a time gap are always kept so broken lines still
+end where the data does.
+"""
+
+import numpy as np
+
+
+def decimate(timestamps, coords, resolution, budget, recent=0.0, max_gap=None):
+    """
+    Pick the samples to draw.
+
+    Args:
+        timestamps (ndarray): Sample times in seconds, ascending
+        coords (list): Coordinate arrays (x, y and optionally z) of the samples
+        resolution (list): Size of one pixel in data units along each coordinate
+        budget (int): Number of samples to draw at most; a few more may be
+            needed to end lines at time gaps
+        recent (float): Seconds at the end of the data drawn in full, cut
+            short if they hold more than half of the budget
+        max_gap (float): Time gap that breaks a line, None if lines are never
+            broken
+
+    Returns:
+        Ascending int array of sample indices to draw
+    """
+    count = len(timestamps)
+    if count <= budget:
+        return np.arange(count)
+    # Everything from here on is drawn at full resolution
+    detailed = int(np.searchsorted(timestamps, timestamps[-1] - recent))
+    detailed = max(detailed, count - budget // 2, 1)
+    budget -= count - detailed
+
+    old = slice(0, detailed)
+    # changed[i] is True if sample i + 1 must not be merged into sample i
+    changed = np.zeros(detailed - 1, dtype=bool)
+    for values, step in zip(coords, resolution):
+        cells = np.floor(values[old] / step)
+        changed |= cells[1:] != cells[:-1]
+    gaps = np.zeros(detailed - 1, dtype=bool)
+    if max_gap is not None:
+        gaps = np.diff(timestamps[old]) > max_gap
+        changed |= gaps
+
+    keep = np.zeros(detailed, dtype=bool)
+    keep[0] = keep[-1] = True
+    keep[1:] |= changed
+    keep[:-1] |= changed
+    kept = np.flatnonzero(keep)
+
+    if len(kept) > budget:
+        boundaries = np.flatnonzero(gaps)
+        kept = _extremes(kept, [values[old] for values in coords], budget,
+                         np.concatenate((boundaries, boundaries + 1)))
+    return np.concatenate((kept, np.arange(detailed, count)))
+
+
+def _extremes(kept, coords, budget, boundaries):
+    # First sample plus min and max of every coordinate per bucket
+    per_bucket = 1 + 2 * len(coords)
+    buckets = max(1, (budget - len(boundaries)) // per_bucket)
+    size = -(-len(kept) // buckets)
+    # Pad the last bucket with its final sample so all buckets are equal
+    padded = np.pad(kept, (0, size * buckets - len(kept)), mode='edge').reshape(-1, size)
+
+    picks = [padded[:, 0], kept[-1:], boundaries]
+    for values in coords:
+        bucket_values = values[padded]
+        for pick in (bucket_values.argmin(axis=1), bucket_values.argmax(axis=1)):
+            picks.append(np.take_along_axis(padded, pick[:, None], axis=1)[:, 0])
+    return np.unique(np.concatenate(picks))
@@ -1,23 +1,109 @@
 #!/usr/bin/env python3
 """
 Real-time serial data plotting script with matplotlib.
-Reads timestamp (us), x, y, z values from serial port and plots them in real-time 3D.
-Implements configurable time window for data fading.
+Reads timestamp (us), x, y, z values from serial port and plots them in real-time 3D,
+or as a blitted 2D x/y trajectory with z shown as colour and marker size.
+Values arrive either as text lines or as binary frames (see touch_stream.py).
+The raw formats carry the eight touch channels instead of x/y/z; centroids are
+then computed here, with electrode weightings that can be cycled live with the
+'w' key, and the channels are shown as a 4x4 heatmap.
+With --target-fps the animation interval and the number of points drawn adapt
+to the measured frame cost (see frame_rate); the figure title shows both.
+Implements configurable time window for data fading. Long, dense windows are
+drawn at a level of detail matched to the axes size (see plot_lod), with the
+newest samples always in full.
+Gesture lines printed by the firmware are annotated on the trajectory, with
+rolling p50/p95/p99 latencies from the end of the touch to the event and to
+the label being drawn.
+
+Heavy modules (numpy, pyserial, matplotlib and the local modules built on
+them) are only loaded by the code paths that use them, so e.g. --help starts
+instantly. Use --profile-startup to see where import time goes.
 """
 
-import serial
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from mpl_toolkits.mplot3d import Axes3D
-from collections import deque
 import time
+
+# Reference point for --profile-startup
+_START_TIME = time.perf_counter()
+
 import argparse
+import importlib
+import importlib.util
+import sys
 from datetime import datetime
-import numpy as np
+
+
+def lazy_import(name):
+    """
+    Import a module that is only loaded on first attribute access.
+
+    This is the importlib.util.LazyLoader recipe from the Python docs.
+
+    Args:
+        name (str): Module to import
+
+    Returns:
+        The (not yet executed) module
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+np = lazy_import('numpy')
+serial = lazy_import('serial')
+
+# Modules loaded by --profile-startup, roughly in the order the plotter needs them
+STARTUP_MODULES = [
+    'numpy',
+    'serial',
+    'touch_stream',
+    'sample_handoff',
+    'touch_pipeline',
+    'sample_buffer',
+    'touch_record',
+    'touch_simulator',
+    'multi_serial',
+    'latency_stats',
+    'gesture_detector',
+    'plot_lod',
+    'frame_rate',
+    'matplotlib',
+    'matplotlib.pyplot',
+    'matplotlib.animation',
+    'mpl_toolkits.mplot3d',
+]
+
+# Colour/size and fade buckets used to draw points in the 2D view
+Z_LEVELS = 8
+FADE_LEVELS = 4
+
+# Most recent gestures kept annotated on the plot
+GESTURE_LABELS = 4
+
+# Samples drawn per pixel of axes width before the level of detail is reduced
+LOD_POINTS_PER_PIXEL = 2
+
+# Per-frame decay of the channel heatmap's colour scale peak
+HEATMAP_DECAY = 0.99
+
+# Seconds between refreshes of the frame rate shown in the title
+TITLE_INTERVAL = 1.0
 
 class RealtimePlotter:
     def __init__(self, port='/dev/ttyUSB0', baudrate=115200, time_window=10.0,
-                 max_points=1000, fade_effect=True, update_interval=20):
+                 max_points=1000, fade_effect=True, update_interval=20,
+                 stream_format='ascii', max_gap=0.5, view='3d', smoothing=1,
+                 spike_step=None, ax=None, lod=True, lod_recent=0.25, weightings=None,
+                 target_fps=None):
         """
         Initialize the real-time plotter.
 
@@ -28,6 +114,26 @@ class RealtimePlotter:
             max_points (int): Maximum number of points to store
             fade_effect (bool): Whether to enable fading effect for old data
             update_interval (int): Animation update interval in milliseconds
+            stream_format (str): Serial wire format, 'ascii', 'binary', 'ascii-raw' or
+                'binary-raw' (see touch_stream.make_decoder)
+            max_gap (float): Maximum time gap in seconds between points that
+                are still connected by a line
+            view (str): '3d' for an x/y/z scatter, '2d' for a blitted x/y
+                trajectory with z mapped to colour and size
+            smoothing (int): Moving average window applied to x/y/z, 1 for none
+            spike_step (float): Drop single-sample jumps larger than this,
+                None to keep every sample
+            ax (Axes): Existing axes to draw into, e.g. one panel of a
+                MultiPortPlotter; a new figure is created if None
+            lod (bool): Draw long windows decimated to the axes resolution
+                instead of every stored sample
+            lod_recent (float): Most recent seconds always drawn in full
+            weightings (list): Electrode weightings for the raw formats, each
+                four weights (see touch_stream.centroids); 'w' cycles through
+                them, the firmware's weights are used if None
+            target_fps (float): Adapt the animation interval and the number
+                of points drawn to hold this frame rate, None for a fixed
+                update_interval; the point budget needs lod
         """
         self.port = port
         self.baudrate = baudrate
@@ -35,29 +141,94 @@ class RealtimePlotter:
         self.max_points = max_points
         self.fade_effect = fade_effect
         self.update_interval = update_interval
+        self.stream_format = stream_format
+        self.max_gap = max_gap
+        self.view = view
+        self.smoothing = smoothing
+        self.spike_step = spike_step
+        self.lod = lod
+        self.lod_recent = lod_recent
+
+        from latency_stats import LatencyTracker
+        from sample_buffer import SampleBuffer
+        from sample_handoff import SampleHandoff
+        from touch_stream import CHANNEL_WEIGHTS, RAW_FORMATS
+
+        # Raw channel formats: centroid weightings and the decoder whose
+        # newest readings feed the heatmap
+        self.show_channels = stream_format in RAW_FORMATS
+        self.weightings = list(weightings) if weightings else [CHANNEL_WEIGHTS]
+        self.weighting = 0
+        self.decoder = None
+
+        # Adaptive frame rate: perf_counter() times at which the current
+        # frame started and was last drawn, points drawn and their budget
+        self.frame_rate = None
+        if target_fps:
+            from frame_rate import FrameRateController
+            self.frame_rate = FrameRateController(target_fps, update_interval)
+        self._frame_start = None
+        self._frame_drawn = None
+        self._title_updated = 0.0
+        self.drawn_points = 0
+        self.point_budget = None
 
         # Data storage
-        self.timestamps = deque(maxlen=max_points)
-        self.x_values = deque(maxlen=max_points)
-        self.y_values = deque(maxlen=max_points)
-        self.z_values = deque(maxlen=max_points)
+        self.buffer = SampleBuffer(capacity=max_points, time_window=time_window)
 
-        # Serial connection
+        # Serial connection, processed by a threaded pipeline (see
+        # touch_pipeline) whose last stage hands batches to the animation
         self.serial_conn = None
+        self.pipeline = None
+        self.handoff = SampleHandoff()
+
+        # Gesture latency, all on the host clock: classify is the release
+        # sample being read until the event line is read, render the event
+        # until its label is drawn, total both together
+        self.latency = {stage: LatencyTracker() for stage in ('classify', 'render', 'total')}
 
-        # Plot setup - 3D plot
-        self.fig = plt.figure(figsize=(12, 10))
-        self.ax = self.fig.add_subplot(111, projection='3d')
-        self.fig.suptitle(f'Real-time 3D Serial Data Plot\nPort: {port}, Time Window: {time_window}s')
+        # Plot setup - 3D plot, or 2D trajectory. matplotlib is imported here
+        # rather than at module level so headless modes never load it.
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d import Axes3D  # registers the 3d projection
 
-        # Initialize 3D plot
-        self.setup_plots()
+        # Figure title, None when drawing into a panel of another figure
+        self.title = None
+        if ax is not None:
+            self.ax = ax
+            self.fig = ax.figure
+        else:
+            self.fig = plt.figure(figsize=(12, 10))
+            if view == '2d':
+                self.ax = self.fig.add_subplot(111)
+            else:
+                self.ax = self.fig.add_subplot(111, projection='3d')
+            self.title = f'Real-time {view.upper()} Serial Data Plot\nPort: {port}, Time Window: {time_window}s'
+            self.fig.suptitle(self.title)
+
+        # Initialize plot
+        if view == '2d':
+            self.setup_2d_plot()
+        else:
+            self.setup_plots()
+        self.setup_gesture_labels()
+        self.heatmap = None
+        if self.show_channels:
+            self.setup_heatmap()
+            self.fig.canvas.mpl_connect('key_press_event', self.on_key)
+        if self.frame_rate is not None:
+            self.setup_frame_marker()
+        if ax is not None:
+            self.ax.set_title(port)
 
         # Animation
         self.ani = None
 
     def setup_plots(self):
         """Setup the 3D plot."""
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
         self.ax.set_xlabel('X Values')
         self.ax.set_ylabel('Y Values')
         self.ax.set_zlabel('Z Values')
@@ -72,10 +243,180 @@ class RealtimePlotter:
         self.ax.set_ylim(-10, 10)
         self.ax.set_zlim(0, 10)
 
+        # Artists are created once and updated in place on every frame
+        self.scatter = self.ax.scatter([], [], [], s=20, depthshade=False)
+        self.lines = Line3DCollection([], colors='red', alpha=0.6, linewidths=1.5)
+        self.ax.add_collection(self.lines, autolim=False)
+        self.point_colors = np.empty((0, 4))
+        self.artists = (self.scatter, self.lines)
+
         plt.tight_layout()
 
+    def setup_2d_plot(self):
+        """Setup the 2D trajectory plot, drawn with blitting."""
+        import matplotlib.pyplot as plt
+        from matplotlib.cm import ScalarMappable
+        from matplotlib.collections import LineCollection
+        from matplotlib.colors import Normalize
+
+        self.ax.set_xlabel('X Values')
+        self.ax.set_ylabel('Y Values')
+        self.ax.set_title('Real-time 2D Trajectory (colour/size: Z)')
+        self.ax.grid(True, alpha=0.3)
+
+        # Set initial limits
+        self.ax.set_xlim(-10, 10)
+        self.ax.set_ylim(-10, 10)
+        self.z_norm = Normalize(0, 10)
+
+        # Animated artists are left out of full redraws and blitted on top
+        # of the cached background on every frame
+        self.lines = LineCollection([], colors='red', alpha=0.6, linewidths=1.5, animated=True)
+        self.ax.add_collection(self.lines, autolim=False)
+
+        # Points are drawn as one marker line per (z level, age) bucket:
+        # Agg stamps a cached marker for Line2D, which is far cheaper than
+        # a scatter collection with per-point colours and sizes
+        cmap = plt.get_cmap('viridis')
+        fade_levels = FADE_LEVELS if self.fade_effect else 1
+        self.markers = []
+        for level in range(Z_LEVELS):
+            for age in range(fade_levels):
+                marker, = self.ax.plot(
+                    [], [], linestyle='none', marker='o', markeredgewidth=0,
+                    markersize=2 + 6 * level / (Z_LEVELS - 1),
+                    color=cmap((level + 0.5) / Z_LEVELS),
+                    alpha=0.3 + 0.7 * age / (FADE_LEVELS - 1) if self.fade_effect else 0.8,
+                    zorder=2 + age, animated=True,
+                )
+                self.markers.append(marker)
+        self.fig.colorbar(ScalarMappable(norm=self.z_norm, cmap=cmap), ax=self.ax, label='Z Values')
+        self.artists = (self.lines, *self.markers)
+
+        plt.tight_layout()
+
+    def setup_gesture_labels(self):
+        """Create the gesture annotations and the latency readout."""
+        animated = self.view == '2d'
+        style = dict(fontsize=9, animated=animated,
+                     bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
+        self.gesture_labels = []
+        for _ in range(GESTURE_LABELS):
+            if self.view == '2d':
+                label = self.ax.text(0, 0, '', **style)
+            else:
+                label = self.ax.text(0, 0, 0, '', **style)
+            label.set_visible(False)
+            self._track_render(label)
+            self.gesture_labels.append(label)
+        self.label_times = [None] * GESTURE_LABELS
+        self.next_label = 0
+        # Events whose label has not been drawn yet, by label
+        self.label_events = {}
+
+        text = self.ax.text if self.view == '2d' else self.ax.text2D
+        self.latency_text = text(0.01, 0.99, '', transform=self.ax.transAxes, va='top',
+                                 family='monospace', fontsize=8, animated=animated)
+        self.artists = (*self.artists, *self.gesture_labels, self.latency_text)
+
+    def setup_heatmap(self):
+        """Create the 4x4 channel heatmap in a corner of the plot."""
+        self.heatmap_ax = self.ax.inset_axes([0.74, 0.74, 0.24, 0.24])
+        self.heatmap = self.heatmap_ax.imshow(
+            np.zeros((4, 4)), cmap='inferno', vmin=0, vmax=1, origin='lower',
+            interpolation='nearest', animated=self.view == '2d'
+        )
+        self.heatmap_ax.set_xticks(range(4), [str(c) for c in range(4)])
+        self.heatmap_ax.set_yticks(range(4), [str(c) for c in range(4, 8)])
+        self.heatmap_ax.tick_params(labelsize=7, length=0)
+        self.heatmap_peak = 0.0
+        self.update_heatmap_title()
+        self.artists = (*self.artists, self.heatmap)
+
+    def update_heatmap_title(self):
+        """Show the current electrode weights above the heatmap."""
+        weights = ', '.join(f"{w:g}" for w in self.weightings[self.weighting])
+        self.heatmap_ax.set_title(f"channels, weights {weights}", fontsize=7)
+
+    def update_heatmap(self):
+        """Show the newest channel readings, the colour scale follows their recent peak."""
+        from touch_stream import channel_grid
+
+        readings = self.decoder.readings if self.decoder is not None else None
+        if readings is None:
+            return
+        grid = channel_grid(readings)
+        self.heatmap_peak = max(float(grid.max()), self.heatmap_peak * HEATMAP_DECAY)
+        self.heatmap.set_data(grid)
+        self.heatmap.set_clim(0, self.heatmap_peak or 1)
+
+    def on_key(self, event):
+        """Cycle the electrode weightings of the raw formats with 'w'."""
+        if event.key != 'w' or len(self.weightings) < 2:
+            return
+        self.weighting = (self.weighting + 1) % len(self.weightings)
+        weights = self.weightings[self.weighting]
+        if self.decoder is not None:
+            self.decoder.weights = weights
+        print(f"{self.port}: centroid weights {weights}")
+        self.update_heatmap_title()
+        # The title is part of the cached background when blitting
+        self.fig.canvas.draw_idle()
+
+    def setup_frame_marker(self):
+        """Add an empty text drawn after everything else to time whole frames."""
+        text = self.ax.text if self.view == '2d' else self.ax.text2D
+        marker = text(0, 0, '', transform=self.ax.transAxes, zorder=1e6,
+                      animated=self.view == '2d')
+        draw = marker.draw
+
+        def draw_and_stamp(renderer):
+            draw(renderer)
+            self._frame_drawn = time.perf_counter()
+
+        marker.draw = draw_and_stamp
+        self.artists = (*self.artists, marker)
+
+    def adapt_frame_rate(self):
+        """Feed the last frame's cost to the frame rate controller and apply its settings."""
+        now = time.perf_counter()
+        start, self._frame_start = self._frame_start, now
+        if start is None or self._frame_drawn is None or self._frame_drawn < start:
+            return
+        self.frame_rate.add(self._frame_drawn - start, now - start, self.drawn_points)
+        self.point_budget = self.frame_rate.budget
+        if self.ani is not None:
+            self.ani.event_source.interval = self.frame_rate.interval
+
+        if self.title is not None and now - self._title_updated >= TITLE_INTERVAL:
+            self._title_updated = now
+            self.fig.suptitle(f"{self.title}\n{self.frame_rate.summary()}")
+            if self.view == '2d':
+                # The title is outside the blitted area, redraw it once now
+                self.fig.canvas.draw()
+
+    def _track_render(self, label):
+        # Wrap the label's draw so render latency is taken when it is actually
+        # rasterized, which covers both full redraws and blitting
+        draw = label.draw
+
+        def draw_and_measure(renderer):
+            draw(renderer)
+            event = self.label_events.pop(label, None)
+            if event is not None:
+                now = time.perf_counter()
+                self.latency['render'].add(now - event.received)
+                if event.sample_received is not None:
+                    self.latency['total'].add(now - event.sample_received)
+
+        label.draw = draw_and_measure
+
     def connect_serial(self):
         """Connect to the serial port."""
+        from touch_pipeline import (DecodeStage, HandoffSink, Pipeline, SerialSource,
+                                    SmoothingFilter, SpikeFilter)
+        from touch_stream import make_decoder
+
         try:
             self.serial_conn = serial.Serial(
                 port=self.port,
@@ -83,6 +424,17 @@ class RealtimePlotter:
                 timeout=1
             )
             print(f"Connected to {self.port} at {self.baudrate} baud")
+            self.decoder = make_decoder(self.stream_format)
+            if self.show_channels:
+                self.decoder.weights = self.weightings[self.weighting]
+            stages = [SerialSource(self.serial_conn), DecodeStage(self.decoder)]
+            if self.spike_step is not None:
+                stages.append(SpikeFilter(self.spike_step))
+            if self.smoothing > 1:
+                stages.append(SmoothingFilter(self.smoothing))
+            stages.append(HandoffSink(self.handoff))
+            self.pipeline = Pipeline(stages)
+            self.pipeline.start()
             return True
         except serial.SerialException as e:
             print(f"Failed to connect to {self.port}: {e}")
@@ -90,245 +442,577 @@ class RealtimePlotter:
 
     def disconnect_serial(self):
         """Disconnect from the serial port."""
+        if self.pipeline:
+            self.pipeline.stop()
+            print("Pipeline stats:")
+            print(self.pipeline.format_stats())
+            self.pipeline = None
         if self.serial_conn and self.serial_conn.is_open:
             self.serial_conn.close()
             print(f"Disconnected from {self.port}")
 
-    def parse_serial_data(self, line):
-        """
-        Parse serial data line.
-        Expected format: "timestamp,x,y,z"
-        """
-        try:
-            # Split by comma
-            parts = line.strip().split(',')
+    def read_serial_data(self):
+        """Move all samples handed over by the pipeline into the buffer."""
+        for timestamps, x_vals, y_vals, z_vals in self.handoff.drain():
+            self.buffer.extend(timestamps, x_vals, y_vals, z_vals)
+        for event in self.handoff.drain_events():
+            self.show_gesture(event)
+
+    def show_gesture(self, event):
+        """Annotate a firmware gesture event at the last sample of its touch."""
+        from gesture_detector import DIRECTION_NAMES, GESTURE_NAMES
 
-            if len(parts) >= 4:  # Need 4 elements: timestamp + x + y + z
-                timestamp_us = float(parts[0])  # First element is timestamp
-                x = float(parts[1])            # Second element is x
-                y = float(parts[2])            # Third element is y
-                z = float(parts[3])            # Fourth element is z
+        if event.sample_received is not None:
+            self.latency['classify'].add(event.received - event.sample_received)
+        if not len(self.buffer):
+            return
 
-                # Convert microseconds to seconds
-                timestamp_s = timestamp_us / 1e6
+        timestamps = self.buffer.timestamps
+        index = len(timestamps) - 1
+        if event.timestamp is not None:
+            index = min(int(np.searchsorted(timestamps, event.timestamp)), index)
 
-                return timestamp_s, x, y, z
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing line '{line.strip()}': {e}")
+        name = GESTURE_NAMES[event.type] if event.type < len(GESTURE_NAMES) else str(event.type)
+        if 0 < event.direction < len(DIRECTION_NAMES):
+            name += ' ' + DIRECTION_NAMES[event.direction]
 
-        return None, None, None, None
+        slot = self.next_label
+        self.next_label = (slot + 1) % GESTURE_LABELS
+        label = self.gesture_labels[slot]
+        label.set_text(name)
+        if self.view == '2d':
+            label.set_position((self.buffer.x[index], self.buffer.y[index]))
+        else:
+            label.set_position_3d((self.buffer.x[index], self.buffer.y[index], self.buffer.z[index]))
+        label.set_visible(True)
+        self.label_times[slot] = timestamps[index]
+        self.label_events[label] = event
 
-    def read_serial_data(self):
-        """Read and parse all available data from serial port."""
-        if not self.serial_conn or not self.serial_conn.is_open:
-            return
+    def update_gesture_labels(self, oldest_timestamp):
+        """Hide labels of gestures that left the time window and refresh the latency readout."""
+        for slot, label_time in enumerate(self.label_times):
+            if label_time is not None and label_time < oldest_timestamp:
+                self.gesture_labels[slot].set_visible(False)
+                self.label_times[slot] = None
 
-        try:
-            # Read all available data at once
-            while self.serial_conn.in_waiting > 0:
-                line = self.serial_conn.readline().decode('utf-8', errors='ignore')
-                if line.strip():
-                    timestamp_s, x, y, z = self.parse_serial_data(line)
-                    if timestamp_s is not None:
-                        self.add_data_point(timestamp_s, x, y, z)
-        except Exception as e:
-            print(f"Error reading serial data: {e}")
+        if len(self.latency['classify']) or len(self.latency['render']):
+            self.latency_text.set_text('\n'.join(
+                f"{stage:<9}{tracker.summary()}" for stage, tracker in self.latency.items()
+            ))
+
+    def print_latency_summary(self):
+        """Print the gesture latency percentiles, if any gestures were seen."""
+        if not len(self.latency['classify']) and not len(self.latency['render']):
+            return
+        print("Gesture latency:")
+        for stage, tracker in self.latency.items():
+            print(f"  {stage:<9}{tracker.summary()}")
 
     def add_data_point(self, timestamp_s, x, y, z):
         """Add a new data point to the storage."""
-        # Store data
-        self.timestamps.append(timestamp_s)
-        self.x_values.append(x)
-        self.y_values.append(y)
-        self.z_values.append(z)
-
-        # Remove old data outside time window
-        self.cleanup_old_data(timestamp_s)
+        # Store data, the buffer drops anything outside the time window
+        self.buffer.append(timestamp_s, x, y, z)
 
     def cleanup_old_data(self, current_timestamp):
         """Remove data points outside the time window."""
-        if not self.timestamps:
-            return
-
-        # Convert to numpy arrays for easier manipulation
-        timestamps = np.array(self.timestamps)
-        x_vals = np.array(self.x_values)
-        y_vals = np.array(self.y_values)
-        z_vals = np.array(self.z_values)
-
-                # Find data within time window (compare timestamps directly)
-        # Keep data within the time window from the most recent timestamp
-        if len(timestamps) > 0:
-            most_recent = np.max(timestamps)
-            time_threshold = most_recent - self.time_window
-            valid_indices = timestamps >= time_threshold
-
-            # Update data storage
-            self.timestamps = deque(timestamps[valid_indices], maxlen=self.max_points)
-            self.x_values = deque(x_vals[valid_indices], maxlen=self.max_points)
-            self.y_values = deque(y_vals[valid_indices], maxlen=self.max_points)
-            self.z_values = deque(z_vals[valid_indices], maxlen=self.max_points)
+        self.buffer.evict(current_timestamp)
 
     def update_plot(self, frame):
-        """Update the 3D plot with new data."""
-        # Read new data
+        """Update the plot with new data."""
+        if self.frame_rate is not None:
+            self.adapt_frame_rate()
+
+        # Read new data, whatever the frame rate
         self.read_serial_data()
+        if self.heatmap is not None:
+            self.update_heatmap()
 
-        if not self.timestamps:
-            return
+        if not len(self.buffer):
+            return self.artists
 
-        # Convert to numpy arrays
-        timestamps = np.array(self.timestamps)
-        x_vals = np.array(self.x_values)
-        y_vals = np.array(self.y_values)
-        z_vals = np.array(self.z_values)
+        # Views into the sample buffer, no copies
+        timestamps = self.buffer.timestamps
+        x_vals = self.buffer.x
+        y_vals = self.buffer.y
+        z_vals = self.buffer.z
 
-                        # Store current view before clearing
-        current_elev = self.ax.elev
-        current_azim = self.ax.azim
+        self.update_gesture_labels(timestamps[0])
 
-        # Clear the plot
-        self.ax.clear()
+        # Samples to draw, None for all of them
+        index = self.lod_index(timestamps, x_vals, y_vals, z_vals)
+        self.drawn_points = len(timestamps) if index is None else len(index)
 
-        # Set basic plot properties (without hardcoded limits)
-        self.ax.set_xlabel('X Values')
-        self.ax.set_ylabel('Y Values')
-        self.ax.set_zlabel('Z Values')
-        self.ax.set_title('Real-time 3D Data Plot')
-        self.ax.grid(True, alpha=0.3)
+        if self.view == '2d':
+            self.update_2d_plot(timestamps, x_vals, y_vals, z_vals, index)
+            return self.artists
+
+        # Plot the 3D data, fading older points if enabled
+        if index is None:
+            self.scatter._offsets3d = (x_vals, y_vals, z_vals)
+        else:
+            self.scatter._offsets3d = (x_vals[index], y_vals[index], z_vals[index])
+        self.scatter.set_facecolors(self.get_point_colors(len(x_vals), index))
+
+        # Connect points with lines if gap is less than max_gap
+        self.plot_connected_lines(timestamps, x_vals, y_vals, z_vals, index)
+
+        self.update_limits([
+            (x_vals, self.ax.get_xlim, self.ax.set_xlim),
+            (y_vals, self.ax.get_ylim, self.ax.set_ylim),
+            (z_vals, self.ax.get_zlim, self.ax.set_zlim),
+        ])
 
-        # Restore the user's view (or set initial view if first time)
-        if hasattr(self, '_view_set') and self._view_set:
-            self.ax.view_init(elev=current_elev, azim=current_azim)
+        return self.artists
+
+    def update_2d_plot(self, timestamps, x_vals, y_vals, z_vals, index=None):
+        """Update the blitted 2D trajectory, z sets colour and marker size."""
+        # Bucket every drawn point by z level and age, then hand each marker
+        # line its contiguous slice of the points sorted by bucket
+        count = len(x_vals)
+        if index is None:
+            index = np.arange(count)
+            x_drawn, y_drawn, z_drawn = x_vals, y_vals, z_vals
         else:
-            self.ax.view_init(elev=20, azim=45)
-            self._view_set = True
+            x_drawn, y_drawn, z_drawn = x_vals[index], y_vals[index], z_vals[index]
+        levels = np.clip((self.z_norm(z_drawn) * Z_LEVELS).astype(int), 0, Z_LEVELS - 1)
+        fade_levels = FADE_LEVELS if self.fade_effect else 1
+        ages = index * fade_levels // count
+        buckets = levels * fade_levels + ages
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(len(self.markers) + 1))
+        x_sorted = x_drawn[order]
+        y_sorted = y_drawn[order]
+        for marker, start, end in zip(self.markers, bounds[:-1], bounds[1:]):
+            marker.set_data(x_sorted[start:end], y_sorted[start:end])
+
+        self.plot_connected_lines(timestamps, x_vals, y_vals, index=index)
+
+        limits_changed = self.update_limits([
+            (x_vals, self.ax.get_xlim, self.ax.set_xlim),
+            (y_vals, self.ax.get_ylim, self.ax.set_ylim),
+            (z_vals, lambda: (self.z_norm.vmin, self.z_norm.vmax), self.set_z_range),
+        ])
+        if limits_changed:
+            # Blitting only redraws the animated artists; new limits change
+            # ticks and the colorbar, so redraw the background once now and
+            # let the animation cache it
+            self.fig.canvas.draw()
+
+    def set_z_range(self, z_min, z_max):
+        """Set the z range mapped to colour and marker size in the 2D view."""
+        self.z_norm.vmin = z_min
+        self.z_norm.vmax = z_max
+
+    def lod_index(self, timestamps, x_vals, y_vals, z_vals):
+        """
+        Pick the samples to draw when there are more than the axes can show.
+
+        Returns:
+            Ascending sample indices (see plot_lod.decimate), or None to draw
+            every sample
+        """
+        bbox = self.ax.bbox
+        budget = int(bbox.width * LOD_POINTS_PER_PIXEL)
+        if self.point_budget is not None:
+            budget = min(budget, self.point_budget)
+        if not self.lod or len(timestamps) <= budget:
+            return None
+
+        from plot_lod import decimate
+
+        # Data units per pixel; for the 3D view this ignores the projection,
+        # which is close enough to decide what can't be told apart
+        x_min, x_max = self.ax.get_xlim()
+        y_min, y_max = self.ax.get_ylim()
+        coords = [x_vals, y_vals]
+        resolution = [(x_max - x_min) / bbox.width, (y_max - y_min) / bbox.height]
+        if self.view == '3d':
+            z_min, z_max = self.ax.get_zlim()
+            coords.append(z_vals)
+            resolution.append((z_max - z_min) / bbox.height)
+        return decimate(timestamps, coords, resolution, budget, self.lod_recent, self.max_gap)
+
+    def get_point_colors(self, count, index=None):
+        """
+        Return an RGBA array for count points, reusing the previous one if possible.
+
+        Args:
+            count (int): Number of samples in the buffer
+            index (ndarray): Samples actually drawn, None for all of them;
+                their fade still follows their age among all samples
+        """
+        if index is not None:
+            from matplotlib.colors import to_rgba
+
+            colors = np.tile(to_rgba('blue'), (len(index), 1))
+            if self.fade_effect and count > 1:
+                colors[:, 3] = 0.3 + 0.7 * index / (count - 1)
+            else:
+                colors[:, 3] = 0.8
+            return colors
 
-        if len(x_vals) > 0:
-            # Plot the 3D data
-            if self.fade_effect and len(x_vals) > 1:
+        if len(self.point_colors) != count:
+            from matplotlib.colors import to_rgba
+
+            self.point_colors = np.tile(to_rgba('blue'), (count, 1))
+            if self.fade_effect and count > 1:
                 # Create fading effect based on time
-                alpha_values = np.linspace(0.3, 1.0, len(x_vals))
-                for i in range(len(x_vals)):
-                    self.ax.scatter(x_vals[i], y_vals[i], z_vals[i],
-                                  c='blue', alpha=alpha_values[i], s=20)
+                self.point_colors[:, 3] = np.linspace(0.3, 1.0, count)
             else:
-                # Plot all points with same alpha
-                self.ax.scatter(x_vals, y_vals, z_vals, c='blue', alpha=0.8, s=20)
+                self.point_colors[:, 3] = 0.8
+        return self.point_colors
 
-            # Connect points with lines if gap is less than 0.5 seconds
-            if len(x_vals) > 1:
-                self.plot_connected_lines(timestamps, x_vals, y_vals, z_vals)
+    def update_limits(self, axes):
+        """
+        Auto-adjust limits with some padding.
 
-            # Auto-adjust limits with some padding
-            x_min, x_max = np.min(x_vals), np.max(x_vals)
-            y_min, y_max = np.min(y_vals), np.max(y_vals)
-            z_min, z_max = np.min(z_vals), np.max(z_vals)
+        Limits are only changed when the data leaves the current view or
+        shrinks to less than half of it, so small changes don't force a
+        relayout of the axes on every frame.
 
-            x_range = x_max - x_min if x_max != x_min else 1
-            y_range = y_max - y_min if y_max != y_min else 1
-            z_range = z_max - z_min if z_max != z_min else 1
+        Args:
+            axes (list): (values, get_lim, set_lim) for each axis
 
-            self.ax.set_xlim(x_min - x_range * 0.1, x_max + x_range * 0.1)
-            self.ax.set_ylim(y_min - y_range * 0.1, y_max + y_range * 0.1)
-            self.ax.set_zlim(z_min - z_range * 0.1, z_max + z_range * 0.1)
-        else:
-            # Set default limits if no data
-            self.ax.set_xlim(-10, 10)
-            self.ax.set_ylim(-10, 10)
-            self.ax.set_zlim(0, 10)
+        Returns:
+            True if any limit was changed
+        """
+        changed = False
+        for values, get_lim, set_lim in axes:
+            # Raw samples without a position are NaN
+            values = values[np.isfinite(values)]
+            if values.size == 0:
+                continue
+            v_min, v_max = np.nanmin(values), np.nanmax(values)
+            v_range = v_max - v_min if v_max != v_min else 1
+            lim_min, lim_max = get_lim()
+            if v_min < lim_min or v_max > lim_max or v_range * 1.2 < (lim_max - lim_min) / 2:
+                set_lim(v_min - v_range * 0.1, v_max + v_range * 0.1)
+                changed = True
+        return changed
 
-        plt.tight_layout()
+    def plot_connected_lines(self, timestamps, x_vals, y_vals, z_vals=None, index=None):
+        """
+        Connect points with lines if the time gap is less than max_gap.
 
-    def plot_connected_lines(self, timestamps, x_vals, y_vals, z_vals):
-        """Connect points with lines if the time gap is less than 0.5 seconds."""
-        max_gap = 0.5  # Maximum gap in seconds to connect points
+        Args:
+            timestamps (ndarray): Sample times in seconds
+            x_vals, y_vals, z_vals (ndarray): Sample coordinates, z_vals None
+                in the 2D view
+            index (ndarray): Samples to draw, None for all of them; gaps are
+                still found among all samples
+        """
+        # Split wherever consecutive points are too far apart in time
+        gaps = np.diff(timestamps) > self.max_gap
+        if index is not None:
+            # Break between two drawn samples if any gap lies between them
+            segments = np.concatenate(([0], np.cumsum(gaps)))[index]
+            gaps = np.diff(segments) > 0
+            x_vals, y_vals = x_vals[index], y_vals[index]
+            if z_vals is not None:
+                z_vals = z_vals[index]
+        if z_vals is None:
+            points = np.column_stack((x_vals, y_vals))
+        else:
+            points = np.column_stack((x_vals, y_vals, z_vals))
+        breaks = np.flatnonzero(gaps) + 1
 
-        # Find segments where points are close enough in time
-        segments = []
-        current_segment = [0]  # Start with first point
+        # One polyline per connected segment, all in a single collection
+        self.lines.set_segments([
+            segment for segment in np.split(points, breaks) if len(segment) > 1
+        ])
 
-        for i in range(1, len(timestamps)):
-            time_gap = timestamps[i] - timestamps[i-1]
-            if time_gap <= max_gap:
-                # Continue current segment
-                current_segment.append(i)
-            else:
-                # Gap too large, end current segment and start new one
-                if len(current_segment) > 1:
-                    segments.append(current_segment)
-                current_segment = [i]
-
-        # Add the last segment if it has multiple points
-        if len(current_segment) > 1:
-            segments.append(current_segment)
-
-        # Plot each connected segment
-        for segment in segments:
-            if len(segment) > 1:
-                seg_x = x_vals[segment]
-                seg_y = y_vals[segment]
-                seg_z = z_vals[segment]
-
-                # Plot line connecting points in this segment
-                self.ax.plot(seg_x, seg_y, seg_z,
-                           color='red', alpha=0.6, linewidth=1.5)
+    def start_plotting(self, use_serial=True):
+        """
+        Start the real-time plotting.
 
-    def start_plotting(self):
-        """Start the real-time plotting."""
-        if not self.connect_serial():
+        Args:
+            use_serial (bool): Read from the serial port; disable when another
+                producer (e.g. simulate_data) feeds the handoff
+        """
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+
+        if use_serial and not self.connect_serial():
             return
 
         try:
             # Start animation with configurable update speed
             self.ani = animation.FuncAnimation(
-                self.fig, self.update_plot, interval=self.update_interval, blit=False
+                self.fig, self.update_plot, interval=self.update_interval,
+                blit=(self.view == '2d'), cache_frame_data=False
             )
 
-            print("Starting real-time 3D plot. Press Ctrl+C to stop.")
-            print("Controls: Mouse drag to rotate, mouse wheel to zoom, right-click drag to pan")
+            print(f"Starting real-time {self.view.upper()} plot. Press Ctrl+C to stop.")
+            if self.view == '3d':
+                print("Controls: Mouse drag to rotate, mouse wheel to zoom, right-click drag to pan")
             plt.show()
 
         except KeyboardInterrupt:
             print("\nStopping plot...")
         finally:
             self.disconnect_serial()
+            self.print_latency_summary()
+            if self.frame_rate is not None:
+                print(f"Frame rate: {self.frame_rate.summary()}")
 
-    def simulate_data(self, duration=30):
-        """Simulate data for testing when no serial device is available."""
-        print(f"Simulating data for {duration} seconds...")
+    def simulate_data(self, duration=30, rate=1000, script=None, seed=0, realtime=True):
+        """
+        Feed simulated gestures (see touch_simulator) when no serial device is available.
+
+        Args:
+            duration (float): Simulated seconds
+            rate (float): Sample rate in Hz
+            script (str): Gesture script, random gestures if None
+            seed (int): RNG seed of the noise and the random script
+            realtime (bool): Pace the samples by the wall clock, otherwise
+                push them as fast as the plot consumes them
+        """
+        from touch_simulator import TouchSimulator, parse_script, random_script
+
+        if script:
+            steps = parse_script(script)
+        else:
+            steps = random_script(50, np.random.default_rng(seed))
+        simulator = TouchSimulator(steps, rate=rate, seed=seed)
 
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            current_time = time.time()
-            timestamp_us = current_time * 1e6
+        print(f"Simulating {duration} seconds at {rate:g} Hz...")
+        start = time.monotonic()
+        pushed = simulator.run(self.handoff, duration=duration, realtime=realtime)
+        print(f"Simulation complete: {pushed} samples in {time.monotonic() - start:.2f}s")
 
-            # Generate some sample data (3D spiral with noise)
-            t = current_time - start_time
-            radius = 30 + 10 * np.sin(2 * np.pi * 0.2 * t)
-            x = radius * np.cos(2 * np.pi * 0.5 * t) + np.random.normal(0, 2)
-            y = radius * np.sin(2 * np.pi * 0.5 * t) + np.random.normal(0, 2)
-            z = 20 * np.sin(2 * np.pi * 0.3 * t) + np.random.normal(0, 2)
 
-            self.add_data_point(current_time, x, y, z)
-            time.sleep(0.01)  # 100 Hz simulation
+class MultiPortPlotter:
+    def __init__(self, ports, baudrate=115200, stream_format='ascii', view='2d',
+                 update_interval=20, target_fps=None, **plotter_args):
+        """
+        One figure with a panel per board, all read by a single asyncio loop.
+
+        Args:
+            ports (list): Serial ports, one panel each
+            baudrate (int): Baud rate for all ports
+            stream_format (str): Serial wire format, 'ascii', 'binary', 'ascii-raw' or
+                'binary-raw' (see touch_stream.make_decoder)
+            view (str): '3d' or '2d' panels, see RealtimePlotter
+            update_interval (int): Animation update interval in milliseconds
+            target_fps (float): Adapt the animation interval and the points
+                drawn, shared between the panels, to hold this frame rate;
+                None for a fixed update_interval
+            **plotter_args: Further RealtimePlotter arguments for every panel
+        """
+        import math
+
+        import matplotlib.pyplot as plt
+        from multi_serial import MultiSerialSource
+
+        self.view = view
+        self.update_interval = update_interval
+
+        cols = math.ceil(math.sqrt(len(ports)))
+        rows = math.ceil(len(ports) / cols)
+        self.fig = plt.figure(figsize=(6 * cols, 5 * rows))
+        self.title = f'Real-time {view.upper()} Serial Data Plot, {len(ports)} devices'
+        self.fig.suptitle(self.title)
+        self.plotters = []
+        for device, port in enumerate(ports):
+            ax = self.fig.add_subplot(rows, cols, device + 1,
+                                      projection='3d' if view == '3d' else None)
+            self.plotters.append(RealtimePlotter(
+                port=port, baudrate=baudrate, stream_format=stream_format, view=view,
+                update_interval=update_interval, ax=ax, **plotter_args
+            ))
+
+        self.source = MultiSerialSource(ports, baudrate, stream_format,
+                                        handoffs=[plotter.handoff for plotter in self.plotters])
+        for plotter, decoder in zip(self.plotters, self.source.decoders):
+            plotter.decoder = decoder
+            if plotter.show_channels:
+                decoder.weights = plotter.weightings[plotter.weighting]
+
+        # One frame rate controller for the whole figure, see RealtimePlotter
+        self.frame_rate = None
+        if target_fps:
+            from frame_rate import FrameRateController
+            self.frame_rate = FrameRateController(target_fps, update_interval)
+            # The last panel is drawn last, so its marker times whole frames
+            self.plotters[-1].setup_frame_marker()
+        self._frame_start = None
+        self._title_updated = 0.0
+        self.ani = None
+
+    def adapt_frame_rate(self):
+        """Feed the last frame's cost to the frame rate controller and apply its settings."""
+        now = time.perf_counter()
+        start, self._frame_start = self._frame_start, now
+        frame_drawn = self.plotters[-1]._frame_drawn
+        if start is None or frame_drawn is None or frame_drawn < start:
+            return
+        drawn = sum(plotter.drawn_points for plotter in self.plotters)
+        self.frame_rate.add(frame_drawn - start, now - start, drawn)
+        budget = self.frame_rate.budget
+        for plotter in self.plotters:
+            plotter.point_budget = None if budget is None else budget // len(self.plotters)
+        if self.ani is not None:
+            self.ani.event_source.interval = self.frame_rate.interval
+
+        if now - self._title_updated >= TITLE_INTERVAL:
+            self._title_updated = now
+            self.fig.suptitle(f"{self.title}\n{self.frame_rate.summary()}")
+            if self.view == '2d':
+                # The title is outside the blitted area, redraw it once now
+                self.fig.canvas.draw()
+
+    def update_plot(self, frame):
+        """Update every panel."""
+        if self.frame_rate is not None:
+            self.adapt_frame_rate()
+        return tuple(artist for plotter in self.plotters for artist in plotter.update_plot(frame))
+
+    def start_plotting(self):
+        """Open all ports and start the real-time plot."""
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+
+        if not self.source.start():
+            return
+
+        try:
+            self.ani = animation.FuncAnimation(
+                self.fig, self.update_plot, interval=self.update_interval,
+                blit=(self.view == '2d'), cache_frame_data=False
+            )
+            print(f"Starting real-time plot of {len(self.plotters)} devices. Press Ctrl+C to stop.")
+            plt.show()
+
+        except KeyboardInterrupt:
+            print("\nStopping plot...")
+        finally:
+            self.source.stop()
+            for stats in self.source.stats():
+                print(", ".join(f"{k}={v}" for k, v in stats.items()))
+            for plotter in self.plotters:
+                plotter.print_latency_summary()
+            if self.frame_rate is not None:
+                print(f"Frame rate: {self.frame_rate.summary()}")
+
+
+def profile_startup():
+    """Print how long startup and each heavy import takes."""
+    print(f"{'startup to argument parsing':<32}{(time.perf_counter() - _START_TIME) * 1000:8.1f} ms")
+    total = 0.0
+    for name in STARTUP_MODULES:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        # Force lazily imported modules to actually load
+        getattr(module, '__name__')
+        dir(module)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"{'import ' + name:<32}{elapsed * 1000:8.1f} ms")
+    print(f"{'total imports':<32}{total * 1000:8.1f} ms")
+    print("(each import only counts what earlier ones did not already load)")
 
-        print("Simulation complete.")
 
 def main():
     """Main function with command line argument parsing."""
     parser = argparse.ArgumentParser(description='Real-time 3D serial data plotting')
     parser.add_argument('--port', default='/dev/ttyUSB0', help='Serial port (default: /dev/ttyUSB0)')
+    parser.add_argument('--ports', nargs='+', metavar='PORT',
+                        help='Read several boards at once, one panel (or device index when recording) each')
     parser.add_argument('--baudrate', type=int, default=115200, help='Baud rate (default: 115200)')
     parser.add_argument('--time-window', type=float, default=10.0, help='Time window in seconds (default: 10.0)')
     parser.add_argument('--max-points', type=int, default=1000, help='Maximum data points (default: 1000)')
     parser.add_argument('--no-fade', action='store_true', help='Disable fading effect')
-    parser.add_argument('--update-interval', type=int, default=20, help='Update interval in milliseconds (default: 20)')
+    parser.add_argument('--update-interval', type=int, default=20,
+                        help='(Initial) update interval in milliseconds (default: 20)')
+    parser.add_argument('--target-fps', type=float, default=30,
+                        help='Adapt the update interval and points drawn to hold this frame rate, '
+                             '0 for a fixed --update-interval (default: 30)')
+    parser.add_argument('--max-gap', type=float, default=0.5,
+                        help='Maximum time gap in seconds for connecting points (default: 0.5)')
+    parser.add_argument('--view', choices=['3d', '2d'], default='3d',
+                        help='3D scatter, or 2D x/y trajectory with Z as colour/size (default: 3d)')
+    parser.add_argument('--format', choices=['ascii', 'binary', 'ascii-raw', 'binary-raw'],
+                        default='ascii',
+                        help='Serial data format, the raw ones carry the 8 touch channels (default: ascii)')
+    parser.add_argument('--weights', nargs='+', metavar='W0,W1,W2,W3',
+                        help='Electrode weightings for the raw formats, cycled with the w key '
+                             '(default: -1.5,-0.5,0.5,1.5 as in the firmware)')
+    parser.add_argument('--smooth', type=int, default=1, metavar='N',
+                        help='Moving average over N samples of serial data (default: 1, off)')
+    parser.add_argument('--despike', type=float, metavar='STEP',
+                        help='Drop single-sample jumps larger than STEP from serial data')
+    parser.add_argument('--no-lod', action='store_true',
+                        help='Draw every stored sample instead of decimating long windows')
+    parser.add_argument('--lod-recent', type=float, default=0.25,
+                        help='Most recent seconds always drawn at full detail (default: 0.25)')
+    parser.add_argument('--record', metavar='FILE',
+                        help='Record serial data to FILE without plotting')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='Replay a recording made with --record instead of reading from serial')
+    parser.add_argument('--replay-device', type=int, metavar='N',
+                        help='Device to replay from a recording of several --ports')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay speed relative to real time, 0 for as fast as possible (default: 1.0)')
     parser.add_argument('--simulate', action='store_true', help='Simulate data instead of reading from serial')
-    parser.add_argument('--sim-duration', type=int, default=30, help='Simulation duration in seconds (default: 30)')
+    parser.add_argument('--sim-duration', type=float, default=30, help='Simulation duration in seconds (default: 30)')
+    parser.add_argument('--sim-rate', type=float, default=1000, help='Simulated sample rate in Hz (default: 1000)')
+    parser.add_argument('--sim-script', help='Simulated gesture script, e.g. "TAP@4, SWIPE_L:E@3" (default: random)')
+    parser.add_argument('--sim-seed', type=int, default=0, help='Simulation RNG seed (default: 0)')
+    parser.add_argument('--sim-fast', action='store_true',
+                        help='Run the simulation on its virtual clock, as fast as the plot keeps up')
+
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report startup and import time breakdown, then exit')
 
     args = parser.parse_args()
 
+    weightings = None
+    if args.weights:
+        try:
+            weightings = [tuple(float(w) for w in spec.split(',')) for spec in args.weights]
+        except ValueError:
+            parser.error("--weights must be comma separated numbers")
+        if any(len(weights) != 4 for weights in weightings):
+            parser.error("--weights needs four weights per weighting")
+
+    if args.ports and (args.smooth != 1 or args.despike is not None):
+        # The filters are pipeline stages of the single port path only
+        parser.error("--smooth and --despike are not supported with --ports")
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    if args.record:
+        # Headless capture, matplotlib is never imported
+        if args.ports:
+            from touch_record import record_ports
+            record_ports(args.ports, args.baudrate, args.record, stream_format=args.format)
+        else:
+            from touch_record import record_serial
+            record_serial(args.port, args.baudrate, args.record, stream_format=args.format,
+                          smoothing=args.smooth, spike_step=args.despike)
+        return
+
+    if args.ports:
+        plotter = MultiPortPlotter(
+            args.ports,
+            baudrate=args.baudrate,
+            stream_format=args.format,
+            view=args.view,
+            update_interval=args.update_interval,
+            time_window=args.time_window,
+            max_points=args.max_points,
+            fade_effect=not args.no_fade,
+            max_gap=args.max_gap,
+            lod=not args.no_lod,
+            lod_recent=args.lod_recent,
+            weightings=weightings,
+            target_fps=args.target_fps or None,
+        )
+        plotter.start_plotting()
+        return
+
     # Create plotter
     plotter = RealtimePlotter(
         port=args.port,
@@ -336,18 +1020,49 @@ def main():
         time_window=args.time_window,
         max_points=args.max_points,
         fade_effect=not args.no_fade,
-        update_interval=args.update_interval
+        update_interval=args.update_interval,
+        stream_format=args.format,
+        max_gap=args.max_gap,
+        view=args.view,
+        smoothing=args.smooth,
+        spike_step=args.despike,
+        lod=not args.no_lod,
+        lod_recent=args.lod_recent,
+        weightings=weightings,
+        target_fps=args.target_fps or None,
     )
 
     if args.simulate:
         # Run simulation in a separate thread
         import threading
-        sim_thread = threading.Thread(target=plotter.simulate_data, args=(args.sim_duration,))
+        sim_thread = threading.Thread(target=plotter.simulate_data, args=(args.sim_duration,), kwargs={
+            'rate': args.sim_rate,
+            'script': args.sim_script,
+            'seed': args.sim_seed,
+            'realtime': not args.sim_fast,
+        })
         sim_thread.daemon = True
         sim_thread.start()
 
         # Start plotting
-        plotter.start_plotting()
+        plotter.start_plotting(use_serial=False)
+    elif args.replay:
+        # Replay the recording in a separate thread
+        import threading
+        from touch_record import open_recording, replay_recording
+        try:
+            # Open here so a bad device choice is reported before the replay starts
+            records = open_recording(args.replay, args.replay_device)
+        except ValueError as e:
+            parser.error(str(e))
+        replay_thread = threading.Thread(
+            target=replay_recording, args=(args.replay, plotter.handoff),
+            kwargs={'speed': args.replay_speed, 'records': records}, daemon=True
+        )
+        replay_thread.start()
+
+        # Start plotting
+        plotter.start_plotting(use_serial=False)
     else:
         # Start real-time plotting from serial
         plotter.start_plotting()
@@ -0,0 +1,126 @@
+"""
+Fixed-size sample storage for the real-time plotter.
+
+Samples (timestamp, x, y, z) are kept in a preallocated NumPy ring buffer laid
+out as a struct of arrays. Every sample is written twice, once at its slot and
+once a full capacity further on, so the live window is always one contiguous
+slice and can be handed to matplotlib as a view without copying.
+"""
+
+import numpy as np
+
+
+class SampleBuffer:
+    def __init__(self, capacity=1000, time_window=10.0):
+        """
+        Initialize the sample buffer.
+
+        Args:
+            capacity (int): Maximum number of samples kept
+            time_window (float): Samples older than this many seconds relative
+                to the newest sample are evicted
+        """
+        self.capacity = capacity
+        self.time_window = time_window
+
+        # Rows are timestamp, x, y, z; columns are mirrored (see module doc)
+        self._data = np.zeros((4, 2 * capacity))
+
+        # Absolute sample indices, [start, end) is the live window
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        """Drop all stored samples."""
+        self._start = 0
+        self._end = 0
+
+    def append(self, timestamp_s, x, y, z):
+        """Add a single sample and evict anything outside the time window."""
+        slot = self._end % self.capacity
+        self._data[:, slot] = self._data[:, slot + self.capacity] = (timestamp_s, x, y, z)
+        self._end += 1
+        if self._end - self._start > self.capacity:
+            self._start += 1
+
+        # Timestamps are monotonic, so eviction only ever advances the head
+        threshold = timestamp_s - self.time_window
+        data = self._data[0]
+        while self._start < self._end and data[self._start % self.capacity] < threshold:
+            self._start += 1
+
+    def extend(self, timestamps, x, y, z):
+        """
+        Add a batch of samples at once.
+
+        Args:
+            timestamps (array-like): Sample timestamps in seconds, ascending
+            x, y, z (array-like): Sample values, same length as timestamps
+        """
+        batch = np.vstack((timestamps, x, y, z))
+        count = batch.shape[1]
+        if count == 0:
+            return
+        if count > self.capacity:
+            # Only the newest samples can survive anyway
+            self._end += count - self.capacity
+            batch = batch[:, -self.capacity:]
+            count = self.capacity
+
+        slot = self._end % self.capacity
+        first = min(count, self.capacity - slot)
+        self._data[:, slot:slot + first] = batch[:, :first]
+        self._data[:, self.capacity + slot:self.capacity + slot + first] = batch[:, :first]
+        if first < count:
+            rest = count - first
+            self._data[:, :rest] = batch[:, first:]
+            self._data[:, self.capacity:self.capacity + rest] = batch[:, first:]
+
+        self._end += count
+        self._start = max(self._start, self._end - self.capacity)
+        self.evict(batch[0, -1])
+
+    def evict(self, current_timestamp):
+        """Remove samples older than the time window before current_timestamp."""
+        if self._start == self._end:
+            return
+        threshold = current_timestamp - self.time_window
+        timestamps = self.timestamps
+        self._start += int(np.searchsorted(timestamps, threshold, side='left'))
+
+    def _view(self, row):
+        slot = self._start % self.capacity
+        return self._data[row, slot:slot + len(self)]
+
+    # Views stay valid until the next append/extend overwrites their slots,
+    # so consume them before writing more samples.
+
+    @property
+    def timestamps(self):
+        """Zero-copy view of the stored timestamps, oldest first."""
+        return self._view(0)
+
+    @property
+    def x(self):
+        """Zero-copy view of the stored x values, oldest first."""
+        return self._view(1)
+
+    @property
+    def y(self):
+        """Zero-copy view of the stored y values, oldest first."""
+        return self._view(2)
+
+    @property
+    def z(self):
+        """Zero-copy view of the stored z values, oldest first."""
+        return self._view(3)
+
+    @property
+    def latest_timestamp(self):
+        """Timestamp of the newest sample, or None if the buffer is empty."""
+        if self._start == self._end:
+            return None
+        return self._data[0, (self._end - 1) % self.capacity]
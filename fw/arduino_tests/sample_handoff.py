@@ -0,0 +1,93 @@
+"""
+Handoff of serial ingest results to the real-time plotter.
+
+The serial port is drained on background threads (see touch_pipeline and
+multi_serial), which hand parsed batches to the plotter through a
+SampleHandoff, so slow frames in the matplotlib animation never stall the
+UART. The handoff is a plain deque: append and popleft are atomic in CPython,
+so producer and consumer never take a lock. Gesture events reported by the
+firmware travel through a second deque.
+"""
+
+from collections import deque
+
+
+class SampleHandoff:
+    def __init__(self, max_batches=10000):
+        """
+        Initialize the handoff queue.
+
+        Args:
+            max_batches (int): Number of undelivered batches kept before new
+                batches are dropped (and counted) instead of queued
+        """
+        self.max_batches = max_batches
+        self._batches = deque()
+        self._events = deque(maxlen=max_batches)
+
+        # Only written by the producer thread
+        self.received = 0
+        self.dropped = 0
+
+    def push(self, timestamps, x, y, z):
+        """Queue a batch of samples (arrays of equal length) for the consumer."""
+        count = len(timestamps)
+        if count == 0:
+            return
+        self.received += count
+        if len(self._batches) >= self.max_batches:
+            self.dropped += count
+            return
+        self._batches.append((timestamps, x, y, z))
+
+    def push_event(self, event):
+        """Queue a GestureEvent (see touch_stream) for the consumer."""
+        self._events.append(event)
+
+    def pending(self):
+        """Return the number of batches waiting for the consumer."""
+        return len(self._batches)
+
+    def drain(self):
+        """Return all queued batches, oldest first."""
+        return _drain(self._batches)
+
+    def drain_events(self):
+        """Return all queued gesture events, oldest first."""
+        return _drain(self._events)
+
+
+def _drain(queue):
+    items = []
+    try:
+        while True:
+            items.append(queue.popleft())
+    except IndexError:
+        pass
+    return items
+
+
+def stamp_events(events, timestamps, received, previous_received):
+    """
+    Fill in the host read times of freshly decoded GestureEvents.
+
+    Args:
+        events (list): Events returned by the decoder's pop_events()
+        timestamps (np.ndarray): Sample timestamps decoded from the same read
+        received (float): perf_counter() time of this read
+        previous_received (float): perf_counter() time of the last earlier
+            read that produced samples, or None
+
+    Returns:
+        The events with sample_received and received set
+    """
+    stamped = []
+    for event in events:
+        # The sample before the event either came in with this read or
+        # with an earlier one
+        same_read = len(timestamps) and event.timestamp is not None and event.timestamp >= timestamps[0]
+        stamped.append(event._replace(
+            sample_received=received if same_read else previous_received,
+            received=received,
+        ))
+    return stamped
@@ -0,0 +1,409 @@
+"""
+Threaded processing pipeline for the touchpad stream.
+
+    source -> decoder -> filters ... -> sink
+
+Every stage runs on its own thread and hands items to the next one through a
+bounded queue, so a slow stage applies backpressure instead of letting memory
+grow. Each stage counts the items and samples it passed on (sinks: the ones
+it consumed), the time it spent working and the time it spent blocked on a
+full output queue; together with the depth of its input queue this shows
+which stage saturates first.
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from sample_handoff import stamp_events
+
+# One batch of decoded samples plus the gesture events decoded with it
+SampleBatch = namedtuple('SampleBatch', ['timestamps', 'x', 'y', 'z', 'events'])
+
+# Passed down the queues once a stage has finished
+_END = object()
+
+
+class Stage:
+    """
+    Base class of all pipeline stages.
+
+    Stages override process(), which receives one item from the previous
+    stage and returns the item to pass on, or None to pass nothing. Sources
+    override produce() instead.
+    """
+
+    name = 'stage'
+
+    def __init__(self):
+        # Counters, only written by the stage's thread
+        self.items = 0
+        self.samples = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+
+    def produce(self, stop_event):
+        """Yield items until stop_event is set (sources only)."""
+        raise NotImplementedError
+
+    def process(self, item):
+        """Transform one item, return None to drop it."""
+        return item
+
+    def flush(self):
+        """Return a last item to pass on when the input ends, or None."""
+        return None
+
+    def close(self):
+        """Release resources once the stage's thread is done."""
+
+    def extra_stats(self):
+        """Stage specific counters reported next to the common ones."""
+        return {}
+
+
+class SerialSource(Stage):
+    name = 'serial'
+
+    def __init__(self, serial_conn, rx_buffer_size=4096):
+        """
+        Read raw chunks from a serial port.
+
+        Args:
+            serial_conn (serial.Serial): Open serial connection to read from
+            rx_buffer_size (int): Size of the OS receive buffer; finding it
+                full means bytes were probably lost and is counted as an overrun
+        """
+        super().__init__()
+        self.serial_conn = serial_conn
+        self.rx_buffer_size = rx_buffer_size
+        self.bytes = 0
+        self.overruns = 0
+        self.read_errors = 0
+
+    def produce(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                # Block (up to the port timeout) for the first byte, then
+                # take everything else that is already waiting in one read
+                data = self.serial_conn.read(1)
+                waiting = self.serial_conn.in_waiting
+                if waiting >= self.rx_buffer_size:
+                    self.overruns += 1
+                if waiting > 0:
+                    data += self.serial_conn.read(waiting)
+            except Exception as e:
+                self.read_errors += 1
+                print(f"Error reading serial data: {e}")
+                if not self.serial_conn.is_open:
+                    return
+                continue
+            if data:
+                self.bytes += len(data)
+                yield data, time.perf_counter()
+
+    def extra_stats(self):
+        return {'bytes': self.bytes, 'overruns': self.overruns, 'read_errors': self.read_errors}
+
+
+class DecodeStage(Stage):
+    name = 'decode'
+
+    def __init__(self, decoder):
+        """
+        Turn (bytes, perf_counter time) chunks into SampleBatches.
+
+        Args:
+            decoder: Stream decoder (see touch_stream)
+        """
+        super().__init__()
+        self.decoder = decoder
+        self._last_sample_received = None
+
+    def process(self, item):
+        data, received = item
+        timestamps, x, y, z = self.decoder.feed(data)
+        previous_received = self._last_sample_received
+        if len(timestamps):
+            self._last_sample_received = received
+        events = stamp_events(self.decoder.pop_events(), timestamps, received, previous_received)
+        if not len(timestamps) and not events:
+            return None
+        return SampleBatch(timestamps, x, y, z, events)
+
+    def extra_stats(self):
+        return {'parse_errors': self.decoder.malformed}
+
+
+class SmoothingFilter(Stage):
+    name = 'smooth'
+
+    def __init__(self, window=5):
+        """
+        Moving average of x, y and z over the last window samples.
+
+        Args:
+            window (int): Number of samples averaged
+        """
+        super().__init__()
+        self.window = window
+        self._history = np.empty((3, 0))
+
+    def process(self, batch):
+        count = len(batch.timestamps)
+        if count == 0:
+            return batch
+        values = np.concatenate((self._history, np.vstack((batch.x, batch.y, batch.z))), axis=1)
+        self._history = values[:, -(self.window - 1):] if self.window > 1 else values[:, :0]
+
+        # Windowed sums from one cumulative sum; the first samples of the
+        # stream average over however many samples exist so far
+        cumulative = np.concatenate((np.zeros((3, 1)), np.cumsum(values, axis=1)), axis=1)
+        end = np.arange(values.shape[1] - count, values.shape[1]) + 1
+        start = np.maximum(end - self.window, 0)
+        smoothed = (cumulative[:, end] - cumulative[:, start]) / (end - start)
+        return batch._replace(x=smoothed[0], y=smoothed[1], z=smoothed[2])
+
+
+class SpikeFilter(Stage):
+    name = 'despike'
+
+    def __init__(self, max_step):
+        """
+        Drop single-sample outliers.
+
+        A sample is a spike if x, y or z jumps by more than max_step away from
+        both of its neighbours in opposite directions. Non-finite samples are
+        dropped too. The newest sample is held back until its successor
+        arrives.
+
+        Args:
+            max_step (float): Largest plausible change between two samples
+        """
+        super().__init__()
+        self.max_step = max_step
+        self.rejected = 0
+        self._previous = None
+        self._pending = None
+
+    def process(self, batch):
+        if len(batch.timestamps) == 0:
+            return batch if batch.events else None
+        columns = np.vstack((batch.timestamps, batch.x, batch.y, batch.z))
+        finite = np.isfinite(columns).all(axis=0)
+        self.rejected += int(np.count_nonzero(~finite))
+        columns = columns[:, finite]
+        if self._pending is not None:
+            columns = np.concatenate((self._pending, columns), axis=1)
+        if columns.shape[1] == 0:
+            return batch._replace(timestamps=columns[0], x=columns[1], y=columns[2], z=columns[3])
+
+        # Neighbours of every sample except the held-back newest one
+        previous = columns[1:, :1] if self._previous is None else self._previous
+        values = columns[1:]
+        before = np.diff(np.concatenate((previous, values), axis=1), axis=1)[:, :-1]
+        after = np.diff(values, axis=1)
+        spike = ((np.abs(before) > self.max_step) & (np.abs(after) > self.max_step)
+                 & (np.sign(before) != np.sign(after))).any(axis=0)
+        self.rejected += int(np.count_nonzero(spike))
+
+        kept = columns[:, :-1][:, ~spike]
+        self._pending = columns[:, -1:]
+        if kept.shape[1]:
+            self._previous = kept[1:, -1:]
+        return batch._replace(timestamps=kept[0], x=kept[1], y=kept[2], z=kept[3])
+
+    def flush(self):
+        if self._pending is None or self._pending.shape[1] == 0:
+            return None
+        pending, self._pending = self._pending, None
+        return SampleBatch(*pending, ())
+
+    def extra_stats(self):
+        return {'rejected': self.rejected}
+
+
+class HandoffSink(Stage):
+    name = 'plot'
+
+    def __init__(self, handoff):
+        """
+        Pass batches and gesture events to a SampleHandoff, e.g. the plotter's.
+
+        Args:
+            handoff (SampleHandoff): Queue drained by the consumer
+        """
+        super().__init__()
+        self.handoff = handoff
+
+    def process(self, batch):
+        self.handoff.push(batch.timestamps, batch.x, batch.y, batch.z)
+        for event in batch.events:
+            self.handoff.push_event(event)
+
+    def extra_stats(self):
+        return {'pending': self.handoff.pending(), 'dropped': self.handoff.dropped}
+
+
+class RecordSink(Stage):
+    name = 'record'
+
+    def __init__(self, recorder):
+        """
+        Append batches to a recording.
+
+        Batches are passed on unchanged, so other sinks such as
+        GestureLogSink can follow.
+
+        Args:
+            recorder (SampleRecorder): Open recording (see touch_record)
+        """
+        super().__init__()
+        self.recorder = recorder
+
+    def process(self, batch):
+        self.recorder.write(batch.timestamps, batch.x, batch.y, batch.z)
+        return batch
+
+    def close(self):
+        self.recorder.close()
+
+
+class GestureLogSink(Stage):
+    name = 'gestures'
+
+    def process(self, batch):
+        from gesture_detector import DIRECTION_NAMES, GESTURE_NAMES
+
+        for event in batch.events:
+            # The numbers come straight from the serial line, print unknown ones as is
+            name = GESTURE_NAMES[event.type] if event.type < len(GESTURE_NAMES) else str(event.type)
+            direction = (DIRECTION_NAMES[event.direction] if event.direction < len(DIRECTION_NAMES)
+                         else str(event.direction))
+            print(f"Gesture: {name} {direction} pos={event.position}")
+
+
+class Pipeline:
+    def __init__(self, stages, queue_size=64):
+        """
+        Connect stages with bounded queues.
+
+        Args:
+            stages (list): Source first, then any number of Stages; the last
+                one is the sink and its return values are discarded
+            queue_size (int): Maximum items waiting in front of each stage
+        """
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+        self._stop_event = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(index,), name=f'pipeline-{stage.name}',
+                             daemon=True)
+            for index, stage in enumerate(stages)
+        ]
+        self._started = None
+        self._stopped = None
+
+    def start(self):
+        """Start one thread per stage."""
+        self._started = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop the source and wait for every stage to drain its queue."""
+        self._stop_event.set()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout)
+        self._stopped = time.perf_counter()
+
+    def stats(self):
+        """
+        Return a snapshot of the per-stage metrics.
+
+        Returns:
+            A list with one dict per stage: name, items and samples passed on,
+            samples per second, busy and blocked time as a fraction of the run
+            time, current input queue depth and any stage specific counters
+        """
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._stopped or time.perf_counter()) - self._started
+        elapsed = max(elapsed, 1e-9)
+        stats = []
+        for index, stage in enumerate(self.stages):
+            stats.append({
+                'stage': stage.name,
+                'items': stage.items,
+                'samples': stage.samples,
+                'rate': stage.samples / elapsed,
+                'busy': stage.busy / elapsed,
+                'blocked': stage.blocked / elapsed,
+                'queue': self.queues[index - 1].qsize() if index else 0,
+                **stage.extra_stats(),
+            })
+        return stats
+
+    def format_stats(self):
+        """Format stats() as one line per stage."""
+        lines = []
+        for stats in self.stats():
+            line = (f"{stats['stage']:<9}{stats['samples']:>9} samples {stats['rate']:>9.0f}/s  "
+                    f"busy {stats['busy']:6.1%}  blocked {stats['blocked']:6.1%}  "
+                    f"queue {stats['queue']:>3}")
+            extra = [f"{k}={v}" for k, v in stats.items()
+                     if k not in ('stage', 'items', 'samples', 'rate', 'busy', 'blocked', 'queue')]
+            lines.append(line + ('  ' + ', '.join(extra) if extra else ''))
+        return '\n'.join(lines)
+
+    def _run(self, index):
+        stage = self.stages[index]
+        inbox = self.queues[index - 1] if index else None
+        outbox = self.queues[index] if index < len(self.queues) else None
+        try:
+            if inbox is None:
+                items = stage.produce(self._stop_event)
+                # Sources mostly wait for input, so only their blocked time
+                # is measured
+                for item in items:
+                    self._emit(stage, outbox, item)
+            else:
+                while True:
+                    item = inbox.get()
+                    if item is _END:
+                        break
+                    if outbox is None:
+                        # Sinks pass nothing on, count what they consume
+                        self._count(stage, item)
+                    start = time.perf_counter()
+                    result = stage.process(item)
+                    stage.busy += time.perf_counter() - start
+                    self._emit(stage, outbox, result)
+                self._emit(stage, outbox, stage.flush())
+        except Exception as e:
+            print(f"Pipeline stage '{stage.name}' failed: {e}")
+            # Keep draining so upstream stages never block on a dead stage
+            while inbox is not None and inbox.get() is not _END:
+                pass
+        finally:
+            stage.close()
+            if outbox is not None:
+                outbox.put(_END)
+
+    def _count(self, stage, item):
+        stage.items += 1
+        if isinstance(item, SampleBatch):
+            stage.samples += len(item.timestamps)
+
+    def _emit(self, stage, outbox, item):
+        if item is None or outbox is None:
+            return
+        self._count(stage, item)
+        start = time.perf_counter()
+        outbox.put(item)
+        stage.blocked += time.perf_counter() - start
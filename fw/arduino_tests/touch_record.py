@@ -0,0 +1,340 @@
+"""
+On-disk recordings of touchpad sample streams.
+
+A recording is an append-only file: a small JSON header describing the record
+layout, followed by fixed-size little-endian records. New samples are simply
+appended, so memory use stays bounded for captures of any length, and the
+record area can later be memory-mapped as a NumPy structured array.
+
+    offset  size  content
+    0       8     magic b'CAPKREC\\x00'
+    8       4     uint32 header length n
+    12      n     JSON header: {"version": 1, "dtype": [[name, type], ...]}
+    ...           padding to HEADER_ALIGN
+    ...           records
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from touch_stream import make_decoder
+
+RECORD_MAGIC = b'CAPKREC\x00'
+RECORD_VERSION = 1
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('z', '<f4'),
+])
+# Recordings of several boards tag each sample with its device index
+MULTI_RECORD_DTYPE = np.dtype(RECORD_DTYPE.descr + [('device', '<u1')])
+HEADER_ALIGN = 64
+
+
+class SampleRecorder:
+    def __init__(self, path, dtype=RECORD_DTYPE, flush_interval=1.0):
+        """
+        Create a new recording, overwriting any existing file.
+
+        Args:
+            path (str): File to write
+            dtype (np.dtype): Record layout, RECORD_DTYPE unless extra fields
+                are needed
+            flush_interval (float): Seconds between flushes to disk
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.flush_interval = flush_interval
+        self.samples = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(_encode_header(self.dtype))
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, timestamps, x, y, z, **fields):
+        """
+        Append a batch of samples.
+
+        Args:
+            timestamps (array-like): Sample timestamps in seconds
+            x, y, z (array-like): Sample values
+            **fields: Values for any extra fields of the record dtype
+        """
+        count = len(timestamps)
+        if count == 0:
+            return
+        records = np.empty(count, dtype=self.dtype)
+        records['timestamp'] = timestamps
+        records['x'] = x
+        records['y'] = y
+        records['z'] = z
+        for name, values in fields.items():
+            records[name] = values
+        self._file.write(records.tobytes())
+        self.samples += count
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self):
+        """Flush and close the file."""
+        if not self._file.closed:
+            self._file.close()
+
+
+def _encode_header(dtype):
+    header = json.dumps({
+        'version': RECORD_VERSION,
+        'dtype': [[name, dtype.fields[name][0].str] for name in dtype.names],
+    }).encode('ascii')
+    size = len(RECORD_MAGIC) + 4 + len(header)
+    padding = -size % HEADER_ALIGN
+    return RECORD_MAGIC + np.uint32(len(header)).tobytes() + header + b' ' * padding
+
+
+def read_header(path):
+    """
+    Read the header of a recording.
+
+    Args:
+        path (str): Recording to read
+
+    Returns:
+        A tuple (dtype, data_offset) describing the records
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(RECORD_MAGIC))
+        if magic != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a touch recording")
+        length = int(np.frombuffer(f.read(4), dtype='<u4')[0])
+        header = json.loads(f.read(length))
+    if header['version'] > RECORD_VERSION:
+        raise ValueError(f"{path} uses unsupported recording version {header['version']}")
+    dtype = np.dtype([tuple(field) for field in header['dtype']])
+    size = len(RECORD_MAGIC) + 4 + length
+    return dtype, size + (-size % HEADER_ALIGN)
+
+
+def open_recording(path, device=None):
+    """
+    Memory-map a recording as a read-only structured array.
+
+    Only the pages that are actually accessed are read from disk, so even
+    very long captures can be opened instantly. A partial record at the end,
+    left by a recording that was killed or lost its board mid-write, is
+    ignored.
+
+    Recordings of several boards (MULTI_RECORD_DTYPE) store the samples of
+    all devices interleaved in arrival order. For those, one device's
+    samples are selected and sorted by timestamp; this reads them into
+    memory.
+
+    Args:
+        path (str): Recording to open
+        device (int): Device index to select from a multi-device recording;
+            may be None if the recording holds a single device
+
+    Returns:
+        A np.memmap (or for multi-device recordings an array) with one record
+        per sample in timestamp order, or an empty array if there are no
+        complete records
+
+    Raises:
+        ValueError: If device is None and the recording holds several
+            devices, or device is not in the recording
+    """
+    dtype, offset = read_header(path)
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count <= 0:
+        # mmap can't map an empty region
+        records = np.zeros(0, dtype=dtype)
+    else:
+        records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    if 'device' not in dtype.names:
+        if device not in (None, 0):
+            raise ValueError(f"{path} is a single device recording, it has no device {device}")
+        return records
+
+    devices = np.unique(records['device']).tolist()
+    if device is None:
+        if len(devices) > 1:
+            raise ValueError(f"{path} holds devices {', '.join(map(str, devices))}, choose one")
+        device = devices[0] if devices else 0
+    elif device not in devices:
+        raise ValueError(f"{path} has no samples of device {device}")
+    selected = records[records['device'] == device]
+    return selected[np.argsort(selected['timestamp'], kind='stable')]
+
+
+def replay_recording(path, handoff, speed=1.0, batch_size=1000, max_pending=100,
+                     stop_event=None, device=None, records=None):
+    """
+    Feed a recording into a SampleHandoff, e.g. the plotter's.
+
+    Args:
+        path (str): Recording to replay
+        handoff (SampleHandoff): Queue that receives the sample batches
+        speed (float): Playback speed relative to real time; 0 replays as
+            fast as the consumer keeps up
+        batch_size (int): Maximum samples per batch when replaying at full speed
+        max_pending (int): Undelivered batches allowed before replay waits
+            for the consumer, so nothing is dropped at full speed
+        stop_event (threading.Event): Optional event that ends the replay early
+        device (int): Device to replay from a multi-device recording, see
+            open_recording()
+        records (ndarray): What open_recording(path, device) returned, if the
+            caller already opened the recording; opened here if None
+    """
+    if records is None:
+        records = open_recording(path, device)
+    count = len(records)
+    if count == 0:
+        print(f"{path} contains no samples")
+        return
+    timestamps = records['timestamp']
+    print(f"Replaying {count} samples from {path}...")
+
+    position = 0
+    start = time.monotonic()
+    first_timestamp = timestamps[0]
+    while position < count:
+        if stop_event is not None and stop_event.is_set():
+            break
+        if speed > 0:
+            # Everything recorded up to the current playback time is due
+            playback_time = first_timestamp + (time.monotonic() - start) * speed
+            end = int(np.searchsorted(timestamps, playback_time, side='right'))
+            end = min(end, position + batch_size * 10)
+        else:
+            end = min(position + batch_size, count)
+        if end <= position or handoff.pending() >= max_pending:
+            time.sleep(0.005)
+            continue
+
+        # Copying the slice reads just these records from the mapping
+        batch = np.array(records[position:end])
+        handoff.push(batch['timestamp'], batch['x'], batch['y'], batch['z'])
+        position = end
+
+    elapsed = time.monotonic() - start
+    print(f"Replay complete: {position} samples in {elapsed:.2f}s ({position / max(elapsed, 1e-9):.0f}/s)")
+
+
+def record_serial(port, baudrate, path, stream_format='ascii', status_interval=5.0,
+                  smoothing=1, spike_step=None):
+    """
+    Record a serial stream to disk without any plotting, until Ctrl+C.
+
+    The port is read by the same pipeline as the plotter's (see
+    touch_pipeline), with the recording as its sink; gestures reported by
+    the firmware are printed as they arrive.
+
+    Args:
+        port (str): Serial port to connect to
+        baudrate (int): Baud rate for serial communication
+        path (str): Recording file to write
+        stream_format (str): Serial wire format, see touch_stream.make_decoder
+        status_interval (float): Seconds between progress messages
+        smoothing (int): Moving average window applied before recording, 1 for off
+        spike_step (float): Drop single-sample jumps larger than this before
+            recording, None for off
+    """
+    import serial
+    from touch_pipeline import (DecodeStage, GestureLogSink, Pipeline, RecordSink, SerialSource,
+                                SmoothingFilter, SpikeFilter)
+
+    try:
+        serial_conn = serial.Serial(port=port, baudrate=baudrate, timeout=1)
+    except serial.SerialException as e:
+        print(f"Failed to connect to {port}: {e}")
+        return
+    print(f"Connected to {port} at {baudrate} baud, recording to {path}")
+
+    recorder = SampleRecorder(path)
+    stages = [SerialSource(serial_conn), DecodeStage(make_decoder(stream_format))]
+    if spike_step is not None:
+        stages.append(SpikeFilter(spike_step))
+    if smoothing > 1:
+        stages.append(SmoothingFilter(smoothing))
+    stages += [RecordSink(recorder), GestureLogSink()]
+    pipeline = Pipeline(stages)
+    pipeline.start()
+    start = last_status = time.monotonic()
+    try:
+        while True:
+            time.sleep(0.05)
+            now = time.monotonic()
+            if now - last_status >= status_interval:
+                rate = recorder.samples / (now - start)
+                print(f"{recorder.samples} samples ({rate:.0f}/s)")
+                last_status = now
+    except KeyboardInterrupt:
+        print("\nStopping recording...")
+    finally:
+        # Stopping drains every stage, the record sink closes the file
+        pipeline.stop()
+        serial_conn.close()
+        print(f"Wrote {recorder.samples} samples to {path}")
+        print("Pipeline stats:")
+        print(pipeline.format_stats())
+
+
+def record_ports(ports, baudrate, path, stream_format='ascii', status_interval=5.0):
+    """
+    Record several serial ports into one file, until Ctrl+C.
+
+    Samples carry a 'device' field with the index of their port in ports.
+
+    Args:
+        ports (list): Serial ports to read
+        baudrate (int): Baud rate for all ports
+        path (str): Recording file to write
+        stream_format (str): Serial wire format, 'ascii', 'binary', 'ascii-raw' or
+            'binary-raw' (see touch_stream.make_decoder)
+        status_interval (float): Seconds between progress messages
+    """
+    from multi_serial import MultiSerialSource
+
+    source = MultiSerialSource(ports, baudrate, stream_format)
+    if not source.start():
+        return
+    print(f"Recording {len(ports)} devices to {path}")
+
+    def write_pending(recorder):
+        for device, handoff in enumerate(source.handoffs):
+            for timestamps, x, y, z in handoff.drain():
+                recorder.write(timestamps, x, y, z, device=device)
+
+    start = last_status = time.monotonic()
+    try:
+        with SampleRecorder(path, dtype=MULTI_RECORD_DTYPE) as recorder:
+            try:
+                while True:
+                    write_pending(recorder)
+                    now = time.monotonic()
+                    if now - last_status >= status_interval:
+                        rate = recorder.samples / (now - start)
+                        print(f"{recorder.samples} samples ({rate:.0f}/s)")
+                        last_status = now
+                    time.sleep(0.05)
+            except KeyboardInterrupt:
+                print("\nStopping recording...")
+            source.stop()
+            write_pending(recorder)
+            print(f"Wrote {recorder.samples} samples to {path}")
+    finally:
+        source.stop()
+        for stats in source.stats():
+            print(", ".join(f"{k}={v}" for k, v in stats.items()))
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Deterministic touchpad stream simulator.
+
+Generates timestamp, x, y, z samples of scripted gestures on the 3x3 grid at
+any sample rate. Timestamps come from a virtual clock (sample index / rate),
+and all noise from a seeded RNG, so the same script, rate and seed always
+produce the same stream, whether it is replayed in real time or as fast as
+the consumer can take it. Stroke sizes and durations are derived from
+gestureConfig.h, so the firmware rules (and gesture_detector.py) classify
+them as scripted at any sample rate.
+
+A script is a comma separated list of NAME[:DIRECTION][@POSITION] steps
+using the names printed by the firmware, e.g.
+
+    TAP@4, HOLD@0, SWIPE_S:E@3, SWIPE_L:N@7, SWIPE_RET:W@5, CW_CIRCLE@4
+
+Usage:
+    python3 touch_simulator.py --script "TAP@4, SWIPE_L:E@3" --rate 1000 --output sim.bin
+    python3 touch_simulator.py --random 500 --rate 10000 --seed 1 --output sim.bin
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from gesture_detector import (CONFIG_HEADER, DIRECTION_NAMES, GESTURE_CIRCLE_CCW, GESTURE_CIRCLE_CW,
+                              GESTURE_HOLD, GESTURE_NAMES, GESTURE_SWIPE_LONG, GESTURE_SWIPE_RETURN,
+                              GESTURE_SWIPE_SHORT, GESTURE_TAP, load_config)
+
+# Stroke direction in degrees for each Direction value (0 = east, counter-clockwise)
+DIRECTION_ANGLES = {1: 90.0, 2: 45.0, 3: 0.0, 4: -45.0, 5: -90.0, 6: -135.0, 7: 180.0, 8: 135.0}
+
+# Z while idle and while touching
+IDLE_Z = 0.5
+TOUCH_Z = 4.0
+
+# Noise is drawn at these rates and interpolated, like a band limited sensor,
+# so raising the sample rate oversamples the same signal. The x/y noise is a
+# finger wandering slowly: its speed has to stay well below the drift of a
+# HOLD, or at high sample rates, where the firmware's path history spans only
+# a few milliseconds, the path angle follows the noise and a HOLD sweeps
+# enough arc to be taken for a circle.
+NOISE_RATE = 100.0
+POSITION_NOISE_RATE = 10.0
+
+SimStep = namedtuple('SimStep', ['gesture', 'direction', 'position'])
+
+
+def parse_script(text):
+    """
+    Parse a gesture script.
+
+    Args:
+        text (str): Comma separated NAME[:DIRECTION][@POSITION] steps
+
+    Returns:
+        A list of SimSteps
+    """
+    steps = []
+    for item in text.split(','):
+        item = item.strip().upper()
+        if not item:
+            continue
+        item, _, position = item.partition('@')
+        name, _, direction = item.partition(':')
+        if name not in GESTURE_NAMES[1:]:
+            raise ValueError(f"Unknown gesture '{name}' in script")
+        if direction and direction not in DIRECTION_NAMES[1:]:
+            raise ValueError(f"Unknown direction '{direction}' in script")
+        steps.append(SimStep(
+            GESTURE_NAMES.index(name),
+            DIRECTION_NAMES.index(direction) if direction else 3,
+            int(position) if position else 4,
+        ))
+    return steps
+
+
+def random_script(count, rng):
+    """Return count random SimSteps drawn from rng."""
+    return [
+        SimStep(int(gesture), int(direction), int(position))
+        for gesture, direction, position in zip(
+            rng.integers(GESTURE_TAP, GESTURE_CIRCLE_CCW + 1, count),
+            rng.integers(1, len(DIRECTION_NAMES), count),
+            rng.integers(0, 9, count),
+        )
+    ]
+
+
+class TouchSimulator:
+    def __init__(self, script, rate=1000, seed=0, config=None, noise=0.003, gap=0.3):
+        """
+        Initialize the simulator.
+
+        Args:
+            script (list): SimSteps to perform, repeated until the requested
+                duration is reached
+            rate (float): Sample rate in Hz
+            seed (int): RNG seed, the same seed gives the same stream
+            config (dict): Gesture configuration, gestureConfig.h if None
+            noise (float): Standard deviation of the x/y/z noise
+            gap (float): Seconds of idle samples between strokes
+        """
+        if not script:
+            raise ValueError("Empty gesture script")
+        self.script = list(script)
+        self.rate = rate
+        self.seed = seed
+        self.config = config if config is not None else load_config(CONFIG_HEADER)
+        self.noise = noise
+        self.gap = gap
+
+    def position_center(self, position):
+        """Center of a grid cell (0-8, row major from the top left)."""
+        cols = int(self.config['GRID_COLS'])
+        row, col = divmod(position, cols)
+        return ((col - 1) * self.config['GRID_CELL_WIDTH'],
+                (1 - row) * self.config['GRID_CELL_HEIGHT'])
+
+    def stroke(self, step):
+        """
+        Noise-free x, y path of one stroke, starting in its grid cell.
+
+        Returns:
+            Arrays (x, y), one entry per touching sample
+        """
+        config = self.config
+        x0, y0 = self.position_center(step.position)
+        angle = np.radians(DIRECTION_ANGLES.get(step.direction, 0.0))
+
+        if step.gesture == GESTURE_HOLD:
+            duration = config['HOLD_MIN_DURATION'] / 1e6 * 1.75
+        elif step.gesture == GESTURE_SWIPE_SHORT:
+            duration = 0.15
+        elif step.gesture == GESTURE_SWIPE_LONG:
+            duration = 0.3
+        elif step.gesture == GESTURE_SWIPE_RETURN:
+            duration = 0.4
+        elif step.gesture in (GESTURE_CIRCLE_CW, GESTURE_CIRCLE_CCW):
+            duration = 0.8
+        else:
+            duration = config['HOLD_MIN_DURATION'] / 1e6 * 0.3
+        count = max(int(round(duration * self.rate)), 2)
+        s = np.linspace(0, 1, count)
+        # Ease in and out like a finger does
+        eased = s * s * (3 - 2 * s)
+
+        if step.gesture == GESTURE_SWIPE_SHORT:
+            distance = (config['SWIPE_MIN_DISTANCE'] + config['LONG_SWIPE_DISTANCE']) / 2 * eased
+        elif step.gesture == GESTURE_SWIPE_LONG:
+            distance = config['LONG_SWIPE_DISTANCE'] * 1.3 * eased
+        elif step.gesture == GESTURE_SWIPE_RETURN:
+            distance = config['SWIPE_RETURN_MIN_DISTANCE'] * 1.5 * np.sin(np.pi * s)
+        elif step.gesture in (GESTURE_CIRCLE_CW, GESTURE_CIRCLE_CCW):
+            # Small enough that the diameter never arms swipe-return, which
+            # the firmware checks first
+            radius = config['SWIPE_RETURN_MIN_DISTANCE'] * 0.45
+            turn = -1 if step.gesture == GESTURE_CIRCLE_CW else 1
+            theta = angle + turn * np.radians(config['CIRCLE_MIN_ARC_ANGLE'] * 2) * eased
+            return (x0 + radius * (np.cos(theta) - np.cos(angle)),
+                    y0 + radius * (np.sin(theta) - np.sin(angle)))
+        else:
+            # A slight steady drift, faster than the x/y noise wanders (see
+            # POSITION_NOISE_RATE), so the jitter of a resting finger does
+            # not add up to a circle around the path's center
+            distance = config['SWIPE_MIN_DISTANCE'] * 0.3 * s
+        return x0 + distance * np.cos(angle), y0 + distance * np.sin(angle)
+
+    def generate_cycle(self, rng):
+        """
+        Samples for one pass over the script.
+
+        Args:
+            rng (np.random.Generator): Source of the noise
+
+        Returns:
+            A tuple (x, y, z, label_offsets, label_types) where the label
+            offsets are sample indices in the middle of each stroke
+        """
+        gap = max(int(round(self.gap * self.rate)), 2)
+        first_x, first_y = self.stroke(self.script[0])
+        xs, ys, zs = [np.full(gap, first_x[0])], [np.full(gap, first_y[0])], [np.full(gap, IDLE_Z)]
+        label_offsets = []
+        offset = gap
+        for step in self.script:
+            x, y = self.stroke(step)
+            # The finger lifts where the stroke ended
+            xs += [x, np.full(gap, x[-1])]
+            ys += [y, np.full(gap, y[-1])]
+            zs += [np.full(len(x), TOUCH_Z), np.full(gap, IDLE_Z)]
+            label_offsets.append(offset + len(x) // 2)
+            offset += len(x) + gap
+        x, y, z = np.concatenate(xs), np.concatenate(ys), np.concatenate(zs)
+        noise_x, noise_y = self._noise(rng, len(x), POSITION_NOISE_RATE, 2)
+        noise_z, = self._noise(rng, len(x), NOISE_RATE, 1)
+        return (x + noise_x, y + noise_y, z + noise_z,
+                np.array(label_offsets), np.array([step.gesture for step in self.script]))
+
+    def _noise(self, rng, count, knot_rate, rows):
+        """Band limited noise: normal knots at knot_rate, linearly interpolated."""
+        knot_step = min(knot_rate, self.rate) / self.rate
+        knots = rng.normal(0, self.noise, (rows, int(count * knot_step) + 2))
+        positions = np.arange(count) * knot_step
+        return [np.interp(positions, np.arange(knots.shape[1]), row) for row in knots]
+
+    def generate(self, duration=None, cycles=1):
+        """
+        Generate a whole stream at once.
+
+        Args:
+            duration (float): Virtual seconds to generate, overrides cycles
+            cycles (int): Number of passes over the script
+
+        Returns:
+            A tuple (timestamps, x, y, z, label_times, label_types)
+        """
+        parts = []
+        for part in self._cycles(duration, cycles):
+            parts.append(part)
+        if not parts:
+            empty = np.empty(0)
+            return empty, empty, empty, empty, empty, np.empty(0, dtype=int)
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def batches(self, batch_size, duration=None):
+        """
+        Yield the stream as (timestamps, x, y, z) batches of batch_size samples.
+
+        Args:
+            batch_size (int): Samples per batch (the last one may be shorter)
+            duration (float): Virtual seconds to generate, None for forever
+        """
+        pending = None
+        for timestamps, x, y, z, _, _ in self._cycles(duration, None):
+            block = np.vstack((timestamps, x, y, z))
+            if pending is not None:
+                block = np.concatenate((pending, block), axis=1)
+            full = block.shape[1] // batch_size * batch_size
+            for start in range(0, full, batch_size):
+                yield tuple(block[:, start:start + batch_size])
+            pending = block[:, full:]
+        if pending is not None and pending.shape[1]:
+            yield tuple(pending)
+
+    def run(self, handoff, duration=None, realtime=True, batch_size=None, max_pending=100,
+            stop_event=None):
+        """
+        Push the stream into a SampleHandoff, e.g. the plotter's.
+
+        Args:
+            handoff (SampleHandoff): Queue that receives the batches
+            duration (float): Virtual seconds to run, None for forever
+            realtime (bool): Pace batches by the wall clock; otherwise run on
+                the virtual clock alone, as fast as the consumer keeps up
+            batch_size (int): Samples per batch, 10 ms worth if None
+            max_pending (int): Undelivered batches allowed before a virtual
+                clock run waits for the consumer
+            stop_event (threading.Event): Optional event that ends the run early
+
+        Returns:
+            Number of samples pushed
+        """
+        batch_size = batch_size or max(1, int(self.rate // 100))
+        pushed = 0
+        start = time.monotonic()
+        for timestamps, x, y, z in self.batches(batch_size, duration):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if realtime:
+                delay = start + timestamps[-1] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                while handoff.pending() >= max_pending:
+                    if stop_event is not None and stop_event.is_set():
+                        return pushed
+                    time.sleep(0.001)
+            handoff.push(timestamps, x, y, z)
+            pushed += len(timestamps)
+        return pushed
+
+    def _cycles(self, duration, cycles):
+        # Every cycle draws its noise from the same seeded generator, so the
+        # stream only depends on (script, rate, seed)
+        rng = np.random.default_rng(self.seed)
+        end = None if duration is None else int(round(duration * self.rate))
+        offset = 0
+        cycle = 0
+        while True:
+            if end is not None:
+                if offset >= end:
+                    break
+            elif cycles is not None and cycle >= cycles:
+                break
+            x, y, z, label_offsets, label_types = self.generate_cycle(rng)
+            count = len(x) if end is None else min(len(x), end - offset)
+            timestamps = (offset + np.arange(count)) / self.rate
+            keep = label_offsets < count
+            yield (timestamps, x[:count], y[:count], z[:count],
+                   (offset + label_offsets[keep]) / self.rate, label_types[keep])
+            offset += count
+            cycle += 1
+
+
+def main():
+    """Generate a simulated capture with labels."""
+    parser = argparse.ArgumentParser(description='Generate a deterministic simulated touch capture')
+    script = parser.add_mutually_exclusive_group(required=True)
+    script.add_argument('--script', help='Gesture script, e.g. "TAP@4, SWIPE_L:E@3"')
+    script.add_argument('--random', type=int, metavar='N', help='Use N random gestures')
+    parser.add_argument('--rate', type=float, default=1000, help='Sample rate in Hz (default: 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='RNG seed (default: 0)')
+    parser.add_argument('--noise', type=float, default=0.003, help='x/y/z noise (default: 0.003)')
+    parser.add_argument('--cycles', type=int, default=1, help='Passes over the script (default: 1)')
+    parser.add_argument('--output', required=True,
+                        help='Recording to write, labels go to OUTPUT.labels')
+    parser.add_argument('--format', choices=['record', 'ascii', 'binary'], default='record',
+                        help='Write a --record style recording or a raw serial stream (default: record)')
+
+    args = parser.parse_args()
+
+    if args.script:
+        steps = parse_script(args.script)
+    else:
+        steps = random_script(args.random, np.random.default_rng(args.seed))
+    simulator = TouchSimulator(steps, rate=args.rate, seed=args.seed, noise=args.noise)
+
+    start = time.perf_counter()
+    timestamps, x, y, z, label_times, label_types = simulator.generate(cycles=args.cycles)
+    elapsed = time.perf_counter() - start
+
+    if args.format == 'record':
+        from touch_record import SampleRecorder
+        with SampleRecorder(args.output) as recorder:
+            recorder.write(timestamps, x, y, z)
+    else:
+        timestamps_us = np.round(timestamps * 1e6).astype(np.int64)
+        with open(args.output, 'wb') as f:
+            if args.format == 'binary':
+                from touch_stream import encode_frames
+                f.write(encode_frames(timestamps_us, x, y, z))
+            else:
+                np.savetxt(f, np.column_stack((timestamps_us, x, y, z)),
+                           fmt=['%d', '%.5f', '%.5f', '%.5f'], delimiter=',')
+    with open(args.output + '.labels', 'w') as f:
+        f.write('# time_s,gesture\n')
+        for label_time, label_type in zip(label_times, label_types):
+            f.write(f"{label_time:.6f},{GESTURE_NAMES[label_type]}\n")
+
+    print(f"Generated {len(timestamps)} samples ({timestamps[-1]:.1f}s at {args.rate:g} Hz) "
+          f"and {len(label_times)} gestures in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+"""
+Decoders for the touchpad telemetry stream.
+
+Decoders are fed raw bytes as they arrive from the serial port, in chunks of
+any size, and return whole batches of samples as NumPy arrays. Partial records
+at the end of a chunk are carried over to the next call.
+
+Four wire formats are supported:
+    ascii:      "timestamp,x,y,z\n" lines, timestamp in microseconds, mixed
+                with "Gesture detected: type=NAME (n), dir=NAME (n), pos=n"
+                lines from gesture.cpp, which are returned as GestureEvents
+    binary:     20 byte little-endian frames
+
+        offset  size  field
+        0       2     sync word 0xA5 0x5A
+        2       4     uint32 timestamp (us, wraps after ~71 minutes)
+        6       12    float32 x, y, z
+        18      2     CRC-16/CCITT-FALSE over bytes 2..17
+
+    ascii-raw:  "timestamp,c0,...,c7\n" lines with the eight raw channel
+                deltas of TouchpadPosition instead of x, y and z
+    binary-raw: 40 byte frames, as binary but with sync word 0xA5 0x5B and
+                int32 c0..c7 at offset 6, CRC over bytes 2..37
+
+For the raw formats x, y and z are computed on the host by centroids(), so
+electrode weightings can be changed without reflashing the board.
+"""
+
+import re
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+# Bytes that may appear in a well-formed ASCII record (after whitespace removal)
+_ASCII_ALLOWED = np.zeros(256, dtype=bool)
+_ASCII_ALLOWED[np.frombuffer(b'0123456789.+-eE,\n', dtype=np.uint8)] = True
+
+_NEWLINE = ord('\n')
+_COMMA = ord(',')
+
+# printGesture() output; older firmware printed the numbers only
+_GESTURE_LINE = re.compile(
+    rb'[^\n]*Gesture detected: type=(?:\w+ \()?(\d+)\)?, dir=(?:\w+ \()?(\d+)\)?, '
+    rb'pos=(\d+)[^\n]*\n'
+)
+
+# A gesture reported by the firmware. timestamp is the stream time of the
+# last sample before the event line (None if there was none); the host
+# perf_counter() times at which that sample and the event line were read
+# are filled in by sample_handoff.stamp_events.
+GestureEvent = namedtuple(
+    'GestureEvent', ['type', 'direction', 'position', 'timestamp', 'sample_received', 'received']
+)
+
+# Touch channels per pad: 0-3 are the x electrodes, 4-7 the y electrodes
+CHANNELS = 8
+
+# Electrode weights used by TouchpadPosition::read, from one edge to the other
+CHANNEL_WEIGHTS = (-1.5, -0.5, 0.5, 1.5)
+
+
+def centroids(readings, weights=CHANNEL_WEIGHTS):
+    """
+    Compute x, y and z from raw channel deltas like TouchpadPosition::read.
+
+    As in the firmware, the weighted sums are truncated to integers after
+    every term, so the default weights reproduce the board's own output.
+
+    Args:
+        readings (ndarray): (n, 8) channel deltas
+        weights (sequence): Weight of each of the four electrodes of an axis
+
+    Returns:
+        A tuple (x, y, z) of float arrays; x and y are NaN or infinite where
+        an axis' channels sum to zero
+    """
+    readings = np.asarray(readings, dtype=float).reshape(-1, CHANNELS)
+    sum_x = readings[:, :4].sum(axis=1)
+    sum_y = readings[:, 4:].sum(axis=1)
+    centroid_x = np.zeros(len(readings))
+    centroid_y = np.zeros(len(readings))
+    for i, weight in enumerate(weights):
+        centroid_x = np.trunc(centroid_x + readings[:, i] * weight)
+        centroid_y = np.trunc(centroid_y + readings[:, 4 + i] * weight)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = centroid_x / sum_x
+        y = centroid_y / sum_y
+    return x, y, (sum_x + sum_y) / 2000.0
+
+
+def _positions(readings, weights):
+    # Deltas that cancel out have no position; map the infinite centroids to
+    # NaN, like an all zero sample, so they never reach plot limits as +-inf
+    x, y, z = centroids(readings, weights)
+    x[~np.isfinite(x)] = np.nan
+    y[~np.isfinite(y)] = np.nan
+    return x, y, z
+
+
+def channel_grid(readings):
+    """
+    Spread one sample's eight channel deltas over the 4x4 electrode crossings.
+
+    Each cell is the geometric mean of its row's y channel and its column's
+    x channel, negative deltas count as zero.
+
+    Args:
+        readings (ndarray): The eight channel deltas
+
+    Returns:
+        A (4, 4) float array, rows are y channels 4-7, columns x channels 0-3
+    """
+    readings = np.maximum(np.asarray(readings, dtype=float), 0)
+    return np.sqrt(np.outer(readings[4:], readings[:4]))
+
+
+class AsciiDecoder:
+    """
+    Decoder for "timestamp,x,y,z" text lines, timestamp in microseconds.
+
+    Each chunk is validated and parsed in one vectorized pass: line boundaries,
+    field counts and stray characters are found with array operations over the
+    byte block, and all valid lines are converted by a single np.fromstring
+    call. Malformed lines are counted and skipped. Gesture lines are split
+    out first and collected for pop_events().
+    """
+
+    def __init__(self, fields=4):
+        """
+        Initialize the decoder.
+
+        Args:
+            fields (int): Number of comma separated values per line
+        """
+        self.fields = fields
+        self._carry = b''
+        self._events = []
+        self._last_timestamp = None
+
+        # Counters
+        self.samples = 0
+        self.malformed = 0
+
+    def feed(self, data):
+        """
+        Decode a chunk of bytes.
+
+        Args:
+            data (bytes): Raw bytes read from the stream
+
+        Returns:
+            A tuple (timestamps_s, x, y, z) of float arrays, possibly empty
+        """
+        block = self._carry + data
+        last_newline = block.rfind(b'\n')
+        if last_newline < 0:
+            self._carry = block
+            return self._empty()
+        self._carry = block[last_newline + 1:]
+        block = block[:last_newline + 1]
+        if b'Gesture' in block:
+            values = self._parse_with_events(block)
+        else:
+            values = self.parse_block(block)
+        self.samples += len(values)
+        if len(values):
+            self._last_timestamp = values[-1, 0] / 1e6
+        return self._samples(values)
+
+    def parse_block(self, block):
+        """
+        Parse complete lines into an (n, fields) array of raw values.
+
+        Args:
+            block (bytes): One or more lines, each terminated by a newline
+
+        Returns:
+            A float array with one row per well-formed line
+        """
+        block = block.translate(None, b' \t\r')
+        arr = np.frombuffer(block, dtype=np.uint8)
+        if arr.size == 0:
+            return np.empty((0, self.fields))
+
+        # Per-line feature counts via prefix sums over the whole block
+        is_newline = arr == _NEWLINE
+        is_comma = arr == _COMMA
+        ends = np.flatnonzero(is_newline)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+
+        def per_line(mask):
+            counts = np.concatenate(([0], np.cumsum(mask)))
+            return counts[ends] - counts[starts]
+
+        # A field is empty if a comma is followed by a separator or starts the line
+        empty_field = is_comma & np.concatenate(((is_comma | is_newline)[1:], [True]))
+        empty_field[starts] |= is_comma[starts]
+
+        lengths = ends - starts
+        blank = lengths == 0
+        valid = (
+            ~blank
+            & (per_line(~_ASCII_ALLOWED[arr]) == 0)
+            & (per_line(is_comma) == self.fields - 1)
+            & (per_line(empty_field) == 0)
+        )
+        self.malformed += int(np.count_nonzero(~valid & ~blank))
+
+        count = int(np.count_nonzero(valid))
+        if count == 0:
+            return np.empty((0, self.fields))
+        if count == len(ends):
+            text = block
+        else:
+            keep = np.repeat(valid, lengths + 1)
+            text = arr[keep].tobytes()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                values = np.fromstring(text.replace(b'\n', b',').decode('ascii'), sep=',')
+            except (DeprecationWarning, ValueError):
+                values = None
+        if values is None or values.size != count * self.fields:
+            # Something like "1.2.3" slipped through validation
+            return self._parse_lines(text)
+        return values.reshape(count, self.fields)
+
+    def pop_events(self):
+        """Return the GestureEvents decoded since the last call."""
+        events, self._events = self._events, []
+        return events
+
+    def _parse_with_events(self, block):
+        parts = []
+        position = 0
+        for match in _GESTURE_LINE.finditer(block):
+            values = self.parse_block(block[position:match.start()])
+            if len(values):
+                self._last_timestamp = values[-1, 0] / 1e6
+            parts.append(values)
+            gesture_type, direction, grid_position = (int(v) for v in match.groups())
+            self._events.append(GestureEvent(
+                gesture_type, direction, grid_position, self._last_timestamp, None, None
+            ))
+            position = match.end()
+        parts.append(self.parse_block(block[position:]))
+        return np.concatenate(parts)
+
+    def _samples(self, values):
+        return values[:, 0] / 1e6, values[:, 1], values[:, 2], values[:, 3]
+
+    def _parse_lines(self, text):
+        rows = []
+        for line in text.split(b'\n'):
+            if not line:
+                continue
+            try:
+                rows.append([float(v) for v in line.split(b',')])
+            except ValueError:
+                self.malformed += 1
+        return np.array(rows, dtype=float).reshape(-1, self.fields)
+
+    def _empty(self):
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+
+
+FRAME_SYNC = b'\xa5\x5a'
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('timestamp', '<u4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('z', '<f4'),
+    ('crc', '<u2'),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+
+def _crc16_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[byte] = crc & 0xFFFF
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16(frames):
+    """
+    CRC-16/CCITT-FALSE of every row of a 2D uint8 array.
+
+    The loop runs over byte columns, so a whole batch of frames costs one
+    vectorized step per payload byte.
+    """
+    crc = np.full(frames.shape[0], 0xFFFF, dtype=np.uint16)
+    for column in frames.T:
+        index = ((crc >> 8) ^ column) & 0xFF
+        crc = (crc << 8) ^ _CRC16_TABLE[index]
+    return crc
+
+
+RAW_FRAME_SYNC = b'\xa5\x5b'
+RAW_FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('timestamp', '<u4'),
+    ('readings', '<i4', (CHANNELS,)),
+    ('crc', '<u2'),
+])
+
+
+def _encode(dtype, sync, timestamps_us, **fields):
+    frames = np.zeros(len(timestamps_us), dtype=dtype)
+    frames['sync'] = np.frombuffer(sync, dtype='<u2')[0]
+    frames['timestamp'] = np.asarray(timestamps_us, dtype=np.uint64) & 0xFFFFFFFF
+    for name, values in fields.items():
+        frames[name] = values
+    raw = frames.view(np.uint8).reshape(-1, dtype.itemsize)
+    frames['crc'] = crc16(raw[:, 2:dtype.itemsize - 2])
+    return frames.tobytes()
+
+
+def encode_frames(timestamps_us, x, y, z):
+    """
+    Encode samples as binary frames, mainly for simulation and testing.
+
+    Args:
+        timestamps_us (array-like): Timestamps in microseconds
+        x, y, z (array-like): Sample values
+
+    Returns:
+        The frames as bytes
+    """
+    return _encode(FRAME_DTYPE, FRAME_SYNC, timestamps_us, x=x, y=y, z=z)
+
+
+def encode_raw_frames(timestamps_us, readings):
+    """
+    Encode raw channel samples as binary-raw frames.
+
+    Args:
+        timestamps_us (array-like): Timestamps in microseconds
+        readings (array-like): (n, 8) channel deltas
+
+    Returns:
+        The frames as bytes
+    """
+    return _encode(RAW_FRAME_DTYPE, RAW_FRAME_SYNC, timestamps_us, readings=readings)
+
+
+class BinaryDecoder:
+    """
+    Decoder for the binary frame format described in the module docstring.
+
+    Every occurrence of the sync word is treated as a candidate frame and all
+    candidates in a chunk are checked against their CRC at once, so the
+    decoder resynchronises on its own after corrupted or dropped bytes (or
+    text log lines interleaved with the frames).
+    """
+
+    # Frame layout, see the module docstring
+    frame_sync = FRAME_SYNC
+    frame_dtype = FRAME_DTYPE
+
+    def __init__(self):
+        self._carry = b''
+        self._last_raw_timestamp = None
+        self._timestamp_wraps = 0
+
+        # Counters
+        self.samples = 0
+        self.malformed = 0
+        self.skipped_bytes = 0
+
+    def feed(self, data):
+        """
+        Decode a chunk of bytes.
+
+        Args:
+            data (bytes): Raw bytes read from the stream
+
+        Returns:
+            A tuple (timestamps_s, x, y, z) of float arrays, possibly empty
+        """
+        frames = self.decode_frames(data)
+        self.samples += len(frames)
+        return self._samples(frames)
+
+    def pop_events(self):
+        """Gesture events are only reported in the ASCII format."""
+        return []
+
+    def decode_frames(self, data):
+        """
+        Decode a chunk of bytes into a structured array of frame_dtype.
+
+        Args:
+            data (bytes): Raw bytes read from the stream
+
+        Returns:
+            A structured array holding every frame with a valid CRC
+        """
+        frame_size = self.frame_dtype.itemsize
+        sync = self.frame_sync
+        block = self._carry + data
+        arr = np.frombuffer(block, dtype=np.uint8)
+        last_start = arr.size - frame_size
+        if last_start < 0:
+            self._carry = block
+            return np.empty(0, dtype=self.frame_dtype)
+
+        candidates = np.flatnonzero(
+            (arr[:last_start + 1] == sync[0]) & (arr[1:last_start + 2] == sync[1])
+        )
+        raw = arr[candidates[:, None] + np.arange(frame_size)]
+        frames = raw.view(self.frame_dtype).reshape(-1)
+        valid = crc16(raw[:, 2:frame_size - 2]) == frames['crc']
+
+        # A sync word inside a good frame can only fake a frame if its CRC
+        # also matches; drop such overlaps in favour of the earlier frame
+        starts = candidates[valid]
+        if starts.size > 1:
+            keep = np.concatenate(([True], np.diff(starts) >= frame_size))
+            starts = starts[keep]
+            frames = frames[valid][keep]
+        else:
+            frames = frames[valid]
+
+        # Sync words that merely appear inside an accepted frame's payload are
+        # not corruption, everything else that failed the CRC is
+        rejected = candidates[~valid]
+        if starts.size:
+            owner = np.searchsorted(starts, rejected, side='right') - 1
+            inside = (owner >= 0) & (rejected < starts[np.maximum(owner, 0)] + frame_size)
+            rejected = rejected[~inside]
+        self.malformed += int(rejected.size)
+
+        # Keep anything that could still be the start of an incomplete frame
+        consumed = int(starts[-1]) + frame_size if starts.size else 0
+        carry_from = max(consumed, last_start + 1)
+        self.skipped_bytes += carry_from - frame_size * len(frames)
+        self._carry = block[carry_from:]
+        return frames
+
+    def _samples(self, frames):
+        return (
+            self._unwrap_timestamps(frames['timestamp']) / 1e6,
+            frames['x'].astype(float),
+            frames['y'].astype(float),
+            frames['z'].astype(float),
+        )
+
+    def _unwrap_timestamps(self, raw):
+        # The firmware timestamp is a uint32 of micros(), extend it to 64 bits
+        raw = raw.astype(np.int64)
+        if raw.size == 0:
+            return raw.astype(float)
+        previous = raw[0] if self._last_raw_timestamp is None else self._last_raw_timestamp
+        wrapped = np.diff(np.concatenate(([previous], raw))) < 0
+        wraps = self._timestamp_wraps + np.cumsum(wrapped)
+        self._last_raw_timestamp = raw[-1]
+        self._timestamp_wraps = int(wraps[-1])
+        return (raw + (wraps << 32)).astype(float)
+
+
+class RawAsciiDecoder(AsciiDecoder):
+    """
+    Decoder for "timestamp,c0,...,c7" lines of raw channel deltas.
+
+    Samples are returned as x, y and z computed by centroids() with the
+    decoder's weights, which may be replaced at any time, e.g. from the
+    plotting thread. x and y are NaN where an axis' deltas sum to zero. The
+    channels of the newest sample are kept in readings.
+    """
+
+    def __init__(self, weights=CHANNEL_WEIGHTS):
+        super().__init__(fields=1 + CHANNELS)
+        self.weights = weights
+        self.readings = None
+
+    def _samples(self, values):
+        readings = values[:, 1:]
+        if len(readings):
+            self.readings = readings[-1]
+        return (values[:, 0] / 1e6, *_positions(readings, self.weights))
+
+
+class RawBinaryDecoder(BinaryDecoder):
+    """Decoder for binary-raw frames, see RawAsciiDecoder."""
+
+    frame_sync = RAW_FRAME_SYNC
+    frame_dtype = RAW_FRAME_DTYPE
+
+    def __init__(self, weights=CHANNEL_WEIGHTS):
+        super().__init__()
+        self.weights = weights
+        self.readings = None
+
+    def _samples(self, frames):
+        readings = frames['readings']
+        if len(readings):
+            self.readings = readings[-1].astype(float)
+        return (self._unwrap_timestamps(frames['timestamp']) / 1e6,
+                *_positions(readings, self.weights))
+
+
+DECODERS = {
+    'ascii': AsciiDecoder,
+    'binary': BinaryDecoder,
+    'ascii-raw': RawAsciiDecoder,
+    'binary-raw': RawBinaryDecoder,
+}
+
+# Formats carrying the raw channel deltas
+RAW_FORMATS = ('ascii-raw', 'binary-raw')
+
+
+def make_decoder(stream_format):
+    """
+    Create a decoder for the given wire format.
+
+    Args:
+        stream_format (str): One of the keys of DECODERS
+
+    Returns:
+        A new decoder instance
+    """
+    try:
+        return DECODERS[stream_format]()
+    except KeyError:
+        raise ValueError(f"Unknown stream format '{stream_format}'") from None
@@ -6,8 +6,26 @@ This script creates SVG files containing capacitive touch pad layouts with:
 - Connecting traces between pads
 - Configurable pad spacing, size and corner radius
 
+Grids can also be generated with each distinct pad shape defined once in
+<defs> and placed with <use>, which makes large grids much smaller and faster
+to generate. KiCad's SVG import does not resolve <use>, so the default output
+keeps every pad expanded.
+
+For very large grids and panels, generate(lazy=True) returns a document whose
+rows and columns are generators; write_svg() streams it to a file one pad at
+a time, so memory use does not grow with the grid size. The output is the
+same as str() of the fully built document.
+
+generate(flatten=True) computes the pads of the whole grid at once with
+NumPy (see TouchGrid.shape_batches()) and writes every polygon and line with
+absolute coordinates and no transforms, which KiCad imports faster.
+
+TouchGrid.write_kicad_mod() writes the same grid straight to a KiCad
+footprint, with the vias placed as through-hole pads, so the SVGs don't have
+to be imported into KiCad by hand.
+
 Usage:
-    pip install svg.py
+    pip install svg.py numpy
     python3 generate_svg_capacitive_touch.py
     xdg-open touch_pads.svg
 
@@ -18,20 +36,154 @@ Example:
     ...     f.write(str(svg_content))
 """
 
+import copy
+import hashlib
+import itertools
+import numpy as np
 import svg
-from math import sqrt
+from math import cos, radians, sin, sqrt
 from svg import mm
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
 
 # origin circle to help with alignment in kicad
 origin = svg.Circle(cx=0, cy=0, r=0.1, stroke="black", stroke_width=0.1, fill="none")
 
+_END = object()
+
+
+def write_svg(f: TextIO, element: Optional[svg.Element]) -> None:
+    """
+    Write an SVG element to a file, child by child.
+
+    Produces exactly what str(element) does, but container elements whose
+    elements are iterators (e.g. from TouchGrid.generate(lazy=True)) are
+    consumed and written one child at a time, so neither the element tree nor
+    the output string is ever held in memory as a whole.
+
+    Args:
+        f: Text file to write to
+        element: Element to write, None writes nothing
+    """
+    if element is None:
+        return
+    children = element.elements
+    if isinstance(children, Iterator):
+        # Like an empty list, an exhausted iterator means a self-closing tag
+        first = next(children, _END)
+        children = [] if first is _END else itertools.chain([first], children)
+    if element.text or not children:
+        # Nothing to stream, children are ignored if there is text
+        f.write(str(_without_elements(element)))
+        return
+
+    # Opening tag from the self-closing tag of the same element without children
+    f.write(str(_without_elements(element))[:-2] + ">")
+    for child in children:
+        write_svg(f, child)
+    f.write(f"</{element.element_name}>")
+
+
+def _without_elements(element: svg.Element) -> svg.Element:
+    """Return a shallow copy of element without its children."""
+    empty = copy.copy(element)
+    empty.elements = None
+    return empty
+
+
+def _kicad_number(value: float) -> str:
+    """Format a length the way KiCad writes it: at most 6 decimals, no trailing zeros."""
+    text = f"{value:.6f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _kicad_shape(points: List[float], shape: "Shape", layer: str) -> str:
+    """
+    Format a shape as a KiCad footprint polygon or line.
+
+    Args:
+        points: The shape's points in footprint coordinates
+        shape: The shape, for its width and whether it is filled
+        layer: KiCad layer name
+
+    Returns:
+        The fp_poly or fp_line, one tab indented
+    """
+    stroke = f"\t\t(stroke\n\t\t\t(width {_kicad_number(shape.width)})\n\t\t\t(type solid)\n\t\t)\n"
+    if shape.filled:
+        pts = " ".join(
+            f"(xy {_kicad_number(x)} {_kicad_number(y)})"
+            for x, y in zip(points[::2], points[1::2])
+        )
+        return (
+            f"\t(fp_poly\n\t\t(pts\n\t\t\t{pts}\n\t\t)\n{stroke}"
+            f'\t\t(fill yes)\n\t\t(layer "{layer}")\n\t)\n'
+        )
+    x1, y1, x2, y2 = (_kicad_number(v) for v in points)
+    return (
+        f"\t(fp_line\n\t\t(start {x1} {y1})\n\t\t(end {x2} {y2})\n{stroke}"
+        f'\t\t(layer "{layer}")\n\t)\n'
+    )
+
+
+class Shape(NamedTuple):
+    """
+    A piece of copper of a pad: a filled polygon or a line.
+
+    Attributes:
+        points: Flat list of x and y coordinates in millimeters, the polygon's
+            corners or the two ends of the line
+        width: Stroke width in millimeters
+        filled: True for a filled polygon, False for a line
+        rotation: Degrees to rotate the points by around center, the same
+            direction as SVG's rotate(); None for no rotation
+        center: Point to rotate around
+    """
+
+    points: List[float]
+    width: float
+    filled: bool
+    rotation: Optional[float] = None
+    center: Tuple[float, float] = (0, 0)
+
+
+def _rotation_matrix(angle: float) -> np.ndarray:
+    """
+    Return the matrix rotating row vectors the way SVG's rotate(angle) does.
+
+    Multiples of 90 degrees are exact, so axis-aligned shapes stay aligned.
+    """
+    if angle % 90 == 0:
+        c, s = [(1, 0), (0, 1), (-1, 0), (0, -1)][int(angle // 90) % 4]
+    else:
+        c, s = cos(radians(angle)), sin(radians(angle))
+    return np.array([[c, s], [-s, c]], dtype=float)
+
+
+class ShapeBatch(NamedTuple):
+    """
+    All copies of one pad shape in a grid.
+
+    Attributes:
+        shape: The shape around the origin, for its width and whether it is
+            filled; its points and rotation are already applied in points
+        points: Array of shape (copies, points, 2) of x and y coordinates in
+            millimeters, transform-free
+        electrodes: Array of shape (copies,) of the electrode each copy belongs
+            to, columns first, then rows
+    """
+
+    shape: Shape
+    points: np.ndarray
+    electrodes: np.ndarray
+
 
 class Pad:
     """
     A base class representing a capacitive touch pad with configurable parameters.
 
     This abstract base class defines the common interface and properties for all touch pad types.
-    Subclasses must implement the generate() method to create specific pad shapes.
+    Subclasses must implement the shapes() and back_trace_shapes() methods to describe
+    specific pad shapes, which generate() and generate_back_traces() turn into SVG.
 
     Attributes:
         pitch (float): Distance between pad centers in millimeters
@@ -40,6 +192,9 @@ class Pad:
         trace_width (float): Width of connecting traces between pads in millimeters
     """
 
+    # SVG stroke-linejoin of the pad polygons, None for the SVG default
+    linejoin: Optional[str] = None
+
     def __init__(
         self, pitch: float, radius: float, separation: float, trace_width: float
     ) -> None:
@@ -57,6 +212,58 @@ class Pad:
         self.separation = separation
         self.trace_width = trace_width
 
+    def key(self) -> tuple:
+        """
+        Return the parameters that determine the pad's geometry.
+
+        Pads with equal keys generate identical shapes (relative to the pad
+        center), so a grid only needs to define each shape once.
+
+        Returns:
+            A tuple of the pad type and its dimensions
+        """
+        return (type(self).__name__, self.pitch, self.radius, self.separation, self.trace_width)
+
+    def shapes(
+        self, x: float, y: float, connection_type: str, edge_type: str
+    ) -> List[Shape]:
+        """
+        Describe the copper of the pad.
+
+        Args:
+            x: X coordinate of the pad center in millimeters
+            y: Y coordinate of the pad center in millimeters
+            connection_type: Type of connection ("via" or "trace")
+            edge_type: Type of pad edge shape ("start", "end", or "center")
+
+        Returns:
+            The pad's polygons and lines, including its connections
+
+        Raises:
+            NotImplementedError: This method must be implemented by subclasses
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def back_trace_shapes(
+        self, x: float, y: float, via_diameter: float = 0
+    ) -> List[Shape]:
+        """
+        Describe the trace that connects the vias of two neighbouring pads on
+        the back side of the board.
+
+        Args:
+            x: X coordinate of the pad center in millimeters
+            y: Y coordinate of the pad center in millimeters
+            via_diameter: Diameter of the via in millimeters, defaults to 2x radius of the pad.
+
+        Returns:
+            The trace as a single line, its ends are where the vias go
+
+        Raises:
+            NotImplementedError: This method must be implemented by subclasses
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
     def generate(
         self, x: float, y: float, connection_type: str, edge_type: str
     ) -> svg.G:
@@ -71,11 +278,68 @@ class Pad:
 
         Returns:
             An SVG group element containing the pad and its connections
+        """
+        return svg.G(
+            elements=[
+                self._element(shape)
+                for shape in self.shapes(x, y, connection_type, edge_type)
+            ]
+        )
 
-        Raises:
-            NotImplementedError: This method must be implemented by subclasses
+    def generate_back_traces(
+        self, x: float, y: float, via_diameter: float = 0
+    ) -> svg.G:
         """
-        raise NotImplementedError("Subclasses must implement this method")
+        Generate an SVG group containing just the trace that will connect vias
+        on the back side of the board.
+
+        Args:
+            x: X coordinate of the pad center in millimeters
+            y: Y coordinate of the pad center in millimeters
+            via_diameter: Diameter of the via in millimeters, defaults to 2x radius of the pad.
+
+        Returns:
+            An SVG group containing the connecting trace
+        """
+        return svg.G(
+            elements=[
+                self._element(shape)
+                for shape in self.back_trace_shapes(x, y, via_diameter=via_diameter)
+            ]
+        )
+
+    def _element(self, shape: Shape) -> svg.Element:
+        """
+        Convert a shape to an SVG polygon or line.
+
+        Args:
+            shape: The shape to convert
+
+        Returns:
+            The SVG element, rotated with a transform rather than in its points
+        """
+        transform = None
+        if shape.rotation is not None:
+            transform = [svg.Rotate(shape.rotation, *shape.center)]
+        if shape.filled:
+            return svg.Polygon(
+                points=list(shape.points),
+                stroke="black",
+                stroke_linejoin=self.linejoin,
+                fill="black",
+                stroke_width=shape.width,
+                transform=transform,
+            )
+        x1, y1, x2, y2 = shape.points
+        return svg.Line(
+            x1=x1,
+            y1=y1,
+            x2=x2,
+            y2=y2,
+            stroke="black",
+            stroke_width=shape.width,
+            transform=transform,
+        )
 
 
 class DiamondPad(Pad):
@@ -113,11 +377,11 @@ class DiamondPad(Pad):
         """
         return f"DiamondPad(pitch={self.pitch}, radius={self.radius}, separation={self.separation}, trace_width={self.trace_width})"
 
-    def generate(
+    def shapes(
         self, x: float, y: float, connection_type: str, edge_type: str
-    ) -> svg.G:
+    ) -> List[Shape]:
         """
-        Creates an SVG polygon representing a diamond-shaped capacitive touch pad.
+        Describes a diamond-shaped capacitive touch pad.
 
         Args:
             x: X coordinate of the pad center in millimeters
@@ -131,7 +395,7 @@ class DiamondPad(Pad):
                 - "center": Diamond shape
 
         Returns:
-            An SVG group containing the pad polygon and optional connecting trace
+            The pad polygon and optional connecting trace
         """
         diag = (self.radius + self.separation / 2) * sqrt(2)
         width = (self.pitch / 2) - diag
@@ -141,28 +405,28 @@ class DiamondPad(Pad):
             points = [x - width, y, x + width, y, x, y - width]
         else:
             points = [x - width, y, x, y + width, x + width, y, x, y - width]
-        diamond = svg.Polygon(
-            points=points, stroke="black", fill="black", stroke_width=self.radius * 2
-        )
+        shapes = [Shape(points, self.radius * 2, filled=True)]
         if edge_type != "end" and connection_type == "trace":
-            connector_line = svg.Line(
-                x1=x,
-                y1=y + self.pitch / 2 - self.separation - self.radius,
-                x2=x,
-                y2=y + self.pitch / 2 + self.separation + self.radius,
-                stroke="black",
-                stroke_width=self.trace_width,
+            shapes.append(
+                Shape(
+                    [
+                        x,
+                        y + self.pitch / 2 - self.separation - self.radius,
+                        x,
+                        y + self.pitch / 2 + self.separation + self.radius,
+                    ],
+                    self.trace_width,
+                    filled=False,
+                )
             )
-        else:
-            connector_line = None
-        return svg.G(elements=[diamond, connector_line])
+        return shapes
 
-    def generate_back_traces(
+    def back_trace_shapes(
         self, x: float, y: float, via_diameter: float = 0
-    ) -> svg.G:
+    ) -> List[Shape]:
         """
-        Creates an SVG group containing just the trace that will connect vias
-        on the back side of the board.
+        Describes just the trace that will connect vias on the back side of
+        the board.
 
         Args:
             x: X coordinate of the pad center in millimeters
@@ -170,20 +434,21 @@ class DiamondPad(Pad):
             via_diameter: Diameter of the via in millimeters, defaults to 2x radius of the pad.
 
         Returns:
-            An SVG group containing the connecting trace
+            The connecting trace
         """
         offset = max(self.radius, via_diameter / 2)
-        elements = [
-            svg.Line(
-                x1=x,
-                y1=y + self.pitch / 2 - self.separation - offset,
-                x2=x,
-                y2=y + self.pitch / 2 + self.separation + offset,
-                stroke="black",
-                stroke_width=self.trace_width,
+        return [
+            Shape(
+                [
+                    x,
+                    y + self.pitch / 2 - self.separation - offset,
+                    x,
+                    y + self.pitch / 2 + self.separation + offset,
+                ],
+                self.trace_width,
+                filled=False,
             )
         ]
-        return svg.G(elements=elements)
 
 
 class FlowerPad(Pad):
@@ -221,11 +486,13 @@ class FlowerPad(Pad):
         """
         return f"FlowerPad(pitch={self.pitch}, radius={self.radius}, separation={self.separation}, trace_width={self.trace_width})"
 
-    def generate(
+    linejoin = "round"
+
+    def shapes(
         self, x: float, y: float, connection_type: str, edge_type: str
-    ) -> svg.G:
+    ) -> List[Shape]:
         """
-        Creates an SVG group representing a flower-shaped capacitive touch pad.
+        Describes a flower-shaped capacitive touch pad.
 
         Args:
             x: X coordinate of the pad center in millimeters
@@ -239,8 +506,7 @@ class FlowerPad(Pad):
                 - "center": Four petals in a flower shape
 
         Returns:
-            An SVG group containing the flower pad elements (petals, stems, center)
-            and optional connecting trace
+            The flower pad elements (petals, stems) and optional connecting trace
         """
         width = (self.pitch) / 2 - self.radius
         diag = (self.radius + self.separation / 2) * sqrt(2)
@@ -253,13 +519,6 @@ class FlowerPad(Pad):
             y + width - self.separation,
         ]
 
-        parameters = {
-            "points": points,
-            "stroke": "black",
-            "stroke_linejoin": "round",
-            "fill": "black",
-            "stroke_width": self.radius * 2,
-        }
         if edge_type == "start":
             rotations = [0, 90]
         elif edge_type == "end":
@@ -267,45 +526,50 @@ class FlowerPad(Pad):
         else:
             rotations = [0, 90, 180, 270]
 
-        elements = []
+        shapes = []
         # petal
-        elements += [
-            svg.Polygon(**parameters, transform=[svg.Rotate(rot, x, y)])
+        shapes += [
+            Shape(points, self.radius * 2, filled=True, rotation=rot, center=(x, y))
             for rot in rotations
         ]
         # stem of petal
-        elements += [
-            svg.Line(
-                x1=x + self.trace_width / 2,
-                y1=y,
-                x2=x + self.trace_width / 2,
-                y2=y + self.pitch / 4,
-                stroke="black",
-                stroke_width=self.trace_width,
-                transform=[svg.Rotate(rot, x, y)],
+        shapes += [
+            Shape(
+                [
+                    x + self.trace_width / 2,
+                    y,
+                    x + self.trace_width / 2,
+                    y + self.pitch / 4,
+                ],
+                self.trace_width,
+                filled=False,
+                rotation=rot,
+                center=(x, y),
             )
             for rot in rotations
         ]
 
         if edge_type != "end" and connection_type == "trace":
-            elements += [
-                svg.Line(
-                    x1=x + self.radius,
-                    y1=y + width - self.separation,
-                    x2=x - self.radius,
-                    y2=y + self.pitch / 2 + self.separation + self.radius,
-                    stroke="black",
-                    stroke_width=self.trace_width,
+            shapes.append(
+                Shape(
+                    [
+                        x + self.radius,
+                        y + width - self.separation,
+                        x - self.radius,
+                        y + self.pitch / 2 + self.separation + self.radius,
+                    ],
+                    self.trace_width,
+                    filled=False,
                 )
-            ]
+            )
 
-        return svg.G(elements=elements)
+        return shapes
 
-    def generate_back_traces(
+    def back_trace_shapes(
         self, x: float, y: float, via_diameter: float = 0
-    ) -> svg.G:
+    ) -> List[Shape]:
         """
-        Creates an SVG group with just the trace to connect vias on the back side of the board.
+        Describes just the trace to connect vias on the back side of the board.
 
         Args:
             x: X coordinate of the pad center in millimeters
@@ -313,21 +577,22 @@ class FlowerPad(Pad):
             via_diameter: Diameter of the via in millimeters, defaults to 2x radius of the pad.
 
         Returns:
-            An SVG group containing the connecting trace
+            The connecting trace
         """
         width = (self.pitch) / 2 - self.radius
         offset = max(0, via_diameter / 2 - self.radius)
-        elements = [
-            svg.Line(
-                x1=x + self.radius + offset,
-                y1=y + width - self.separation - offset,
-                x2=x - self.radius - offset,
-                y2=y + self.pitch / 2 + self.separation + self.radius + offset,
-                stroke="black",
-                stroke_width=self.trace_width,
+        return [
+            Shape(
+                [
+                    x + self.radius + offset,
+                    y + width - self.separation - offset,
+                    x - self.radius - offset,
+                    y + self.pitch / 2 + self.separation + self.radius + offset,
+                ],
+                self.trace_width,
+                filled=False,
             )
         ]
-        return svg.G(elements=elements)
 
 
 class TouchGrid:
@@ -356,53 +621,278 @@ class TouchGrid:
         self.x_count = x_count
         self.y_count = y_count
 
-    def generate(self) -> svg.SVG:
+    def generate(
+        self, symbols: bool = False, lazy: bool = False, flatten: bool = False
+    ) -> svg.SVG:
         """
         Generate an SVG representation of the touch pad grid.
 
+        Args:
+            symbols: Define each distinct pad shape once and place it with
+                <use> instead of repeating its geometry for every pad
+            lazy: Generate pads only while the document is written, see
+                write_svg(); such a document can be written only once
+            flatten: Compute all pads at once with shape_batches() and write
+                them with absolute coordinates, without groups or transforms
+
         Returns:
             An SVG document containing the complete touch pad grid layout
+
+        Raises:
+            ValueError: If both symbols and flatten are set
         """
-        columns = [
-            self._row(self.y_count, connection_type="trace")
-            for i in range(self.x_count)
-        ]
-        for i, e in enumerate(columns):
-            e.transform = [svg.Translate(i * self.pad.pitch, 0)]
-        rows = [
-            self._row(self.x_count, connection_type="via") for i in range(self.y_count)
-        ]
-        for i, e in enumerate(rows):
-            e.transform = [
-                svg.Rotate(-90, 0, 0),
-                svg.Translate(
-                    -(i + 1) * self.pad.pitch - self.pad.pitch / 2, self.pad.pitch / 2
-                ),
-            ]
+        if flatten:
+            if symbols:
+                raise ValueError("Flattened grids can't use symbols")
+            elements = itertools.chain([origin], self._flat_elements(self.shape_batches()))
+            return self._document(elements if lazy else list(elements))
+
+        defs = self._pad_defs() if symbols else None
+        columns = self._columns(defs, lazy)
+        rows = self._rows(defs, lazy)
+
+        if lazy:
+            elements = itertools.chain([origin], columns, rows)
+        else:
+            elements = [origin] + list(columns) + list(rows)
+        if symbols:
+            elements = itertools.chain([svg.Defs(elements=list(defs.values()))], elements)
+            if not lazy:
+                elements = list(elements)
+        return self._document(elements)
+
+    def generate_back_traces(
+        self,
+        via_diameter: float = 0,
+        symbols: bool = False,
+        lazy: bool = False,
+        flatten: bool = False,
+    ) -> svg.SVG:
+        """
+        Generate an SVG representation of just the back traces, which will be
+        connected to the pads on the front side using vias.
 
+        Args:
+            via_diameter: Diameter of the vias in millimeters, defaults to 2x radius of the pad.
+            symbols: Define the trace once and place it with <use>, see generate()
+            lazy: Generate traces only while the document is written, see generate()
+            flatten: Write the traces with absolute coordinates, see generate()
+
+        Returns:
+            An SVG document containing just the back traces that will connect the vias
+
+        Raises:
+            ValueError: If both symbols and flatten are set
+        """
+        if flatten:
+            if symbols:
+                raise ValueError("Flattened grids can't use symbols")
+            batches = self.shape_batches(back=True, via_diameter=via_diameter)
+            elements = itertools.chain(self._flat_elements(batches), [origin])
+        elif symbols:
+            return self._back_trace_symbols(via_diameter, lazy)
+        else:
+            elements = itertools.chain(self._back_traces(via_diameter), [origin])
+        return self._document(elements if lazy else list(elements))
+
+    def _document(self, elements) -> svg.SVG:
+        """
+        Wrap elements in an SVG document the size of the grid.
+
+        Args:
+            elements: The document's elements, a list or an iterator
+
+        Returns:
+            The SVG document
+        """
         width = self.pad.pitch * (self.x_count + 1)
         height = self.pad.pitch * (self.y_count + 1)
         return svg.SVG(
             width=str(width) + "mm",
             height=str(height) + "mm",
             viewBox=f"0 0 {width} {height}",
-            elements=[origin] + columns + rows,
+            elements=elements,
         )
 
-    def generate_back_traces(self, via_diameter: float = 0) -> svg.SVG:
+    def shape_batches(self, back: bool = False, via_diameter: float = 0) -> List[ShapeBatch]:
         """
-        Generate an SVG representation of just the back traces, which will be
-        connected to the pads on the front side using vias.
+        Compute every shape of the grid at once, as NumPy arrays.
+
+        Each distinct shape is generated once around the origin by the pad,
+        then rotated and translated to all of its places with one matrix
+        operation per shape, instead of asking the pad for every copy and
+        leaving the rotations to SVG transforms. The coordinates are the same
+        as those of the transformed shapes in generate() and
+        generate_back_traces().
 
         Args:
-            via_diameter: Diameter of the vias in millimeters, defaults to 2x radius of the pad.
+            back: Compute the back traces instead of the front pads
+            via_diameter: Diameter of the vias in millimeters, for the back
+                traces; defaults to 2x radius of the pad.
 
         Returns:
-            An SVG document containing just the back traces that will connect the vias
+            One batch per distinct shape
         """
-        elements = []
-        for i in range(self.x_count):
-            for j in range(self.y_count):
+        pitch = self.pad.pitch
+        batches = []
+        if back:
+            # Rows i of gaps j, placed like _back_traces()
+            i, j = np.divmod(np.arange(self.y_count * self.x_count), self.x_count)
+            centers = np.column_stack((-i * pitch - pitch / 2, pitch / 2 + j * pitch))
+            shapes = self.pad.back_trace_shapes(0, 0, via_diameter=via_diameter)
+            return [
+                self._batch(shape, centers, -90, self.x_count + i) for shape in shapes
+            ]
+
+        for connection_type, lines, count in (
+            ("trace", self.x_count, self.y_count + 1),
+            ("via", self.y_count, self.x_count + 1),
+        ):
+            # Pad j of line i (a column or a row), grouped by edge type
+            i, j = np.divmod(np.arange(lines * count), count)
+            edge_types = np.array([self._get_edge_type(k, count) for k in range(count)])[j]
+            for edge_type in ("start", "center", "end"):
+                selected = edge_types == edge_type
+                if not selected.any():
+                    continue
+                if connection_type == "trace":
+                    # Columns are translated into place, like _columns()
+                    centers = np.column_stack(((i + 1) * pitch, j * pitch))
+                    rotation, electrodes = 0, i
+                else:
+                    # Rows are translated, then rotated by -90, like _rows()
+                    centers = np.column_stack((-i * pitch - pitch / 2, j * pitch + pitch / 2))
+                    rotation, electrodes = -90, self.x_count + i
+                for shape in self.pad.shapes(0, 0, connection_type, edge_type):
+                    batches.append(
+                        self._batch(shape, centers[selected], rotation, electrodes[selected])
+                    )
+        return batches
+
+    def _batch(
+        self, shape: Shape, centers: np.ndarray, rotation: float, electrodes: np.ndarray
+    ) -> ShapeBatch:
+        """
+        Place copies of a shape.
+
+        Args:
+            shape: The shape, generated around the origin
+            centers: Array of shape (copies, 2) of the pad centers before rotation
+            rotation: Degrees to rotate the placed copies by around the origin
+            electrodes: Array of shape (copies,) of the copies' electrodes
+
+        Returns:
+            The placed copies
+        """
+        points = np.asarray(shape.points, dtype=float).reshape(-1, 2)
+        if shape.rotation is not None:
+            # The shape's own rotation is around the pad center, the origin here
+            points = points @ _rotation_matrix(shape.rotation)
+        placed = (points[None, :, :] + centers[:, None, :]) @ _rotation_matrix(rotation)
+        return ShapeBatch(
+            shape._replace(points=[], rotation=None, center=(0, 0)), placed, electrodes
+        )
+
+    def _flat_elements(self, batches: List[ShapeBatch]) -> Iterator[svg.Element]:
+        """
+        Convert shape batches to transform-free SVG elements.
+
+        Args:
+            batches: Shapes from shape_batches()
+
+        Yields:
+            One SVG polygon or line per copy
+        """
+        for batch in batches:
+            for points in batch.points.reshape(len(batch.points), -1).tolist():
+                yield self.pad._element(batch.shape._replace(points=points))
+
+    def write_kicad_mod(self, f: TextIO, name: str, via_diameter: float = 0) -> None:
+        """
+        Write the grid as a KiCad footprint (.kicad_mod).
+
+        The front pads and traces become fp_poly and fp_line on F.Cu, the back
+        traces fp_line on B.Cu, and a through-hole pad is placed at each end of
+        every back trace as the via. The geometry is the same as in generate()
+        and generate_back_traces(), with the footprint origin at the SVG
+        origin, computed by shape_batches(); no SVG is built and the text is
+        written one shape at a time.
+
+        Args:
+            f: Text file to write to
+            name: Footprint name, also used as its value
+            via_diameter: Diameter of the vias in millimeters, defaults to 2x radius of the pad.
+        """
+        f.writelines(self._kicad_mod(name, via_diameter))
+
+    def _kicad_mod(self, name: str, via_diameter: float) -> Iterator[str]:
+        """
+        Generate the text of the footprint.
+
+        Args:
+            name: Footprint name
+            via_diameter: Diameter of the vias in millimeters
+
+        Yields:
+            The footprint, a few lines at a time
+        """
+        yield (
+            f'(footprint "{name}"\n'
+            "\t(version 20241229)\n"
+            '\t(generator "generate_svg_capacitive_touch")\n'
+            '\t(layer "F.Cu")\n'
+        )
+        for prop, value, y, layer, thickness in (
+            ("Reference", "REF**", -0.5, "F.SilkS", 0.1),
+            ("Value", name, 1, "F.Fab", 0.15),
+        ):
+            yield (
+                f'\t(property "{prop}" "{value}"\n'
+                f"\t\t(at 0 {_kicad_number(y)} 0)\n"
+                "\t\t(unlocked yes)\n"
+                f'\t\t(layer "{layer}")\n'
+                f"\t\t(effects\n\t\t\t(font\n\t\t\t\t(size 1 1)\n"
+                f"\t\t\t\t(thickness {_kicad_number(thickness)})\n\t\t\t)\n\t\t)\n"
+                "\t)\n"
+            )
+        yield "\t(attr exclude_from_bom)\n"
+
+        for batch in self.shape_batches():
+            for points in batch.points.reshape(len(batch.points), -1).tolist():
+                yield _kicad_shape(points, batch.shape, "F.Cu")
+
+        size = _kicad_number(via_diameter or self.pad.radius * 2)
+        drill = _kicad_number((via_diameter or self.pad.radius * 2) / 2)
+        for batch in self.shape_batches(back=True, via_diameter=via_diameter):
+            for points, electrode in zip(
+                batch.points.reshape(len(batch.points), -1).tolist(), batch.electrodes.tolist()
+            ):
+                yield _kicad_shape(points, batch.shape, "B.Cu")
+                for x, y in zip(points[::2], points[1::2]):
+                    # Numbered after the columns, like the library footprints
+                    yield (
+                        f'\t(pad "{electrode + 1}" thru_hole circle\n'
+                        f"\t\t(at {_kicad_number(x)} {_kicad_number(y)})\n"
+                        f"\t\t(size {size} {size})\n"
+                        f"\t\t(drill {drill})\n"
+                        '\t\t(layers "*.Cu")\n'
+                        "\t\t(remove_unused_layers no)\n"
+                        "\t)\n"
+                    )
+        yield "\t(embedded_fonts no)\n)\n"
+
+    def _back_traces(self, via_diameter: float) -> Iterator[svg.G]:
+        """
+        Generate the back traces one by one.
+
+        Args:
+            via_diameter: Diameter of the vias in millimeters
+
+        Yields:
+            An SVG group with the trace between each pair of vias
+        """
+        for i in range(self.y_count):
+            for j in range(self.x_count):
                 trace = self.pad.generate_back_traces(
                     self.pad.pitch,
                     0,
@@ -415,16 +905,123 @@ class TouchGrid:
                         self.pad.pitch / 2 + j * self.pad.pitch,
                     ),
                 ]
-                elements += [trace]
+                yield trace
 
-        width = self.pad.pitch * (self.x_count + 1)
-        height = self.pad.pitch * (self.y_count + 1)
-        return svg.SVG(
-            width=str(width) + "mm",
-            height=str(height) + "mm",
-            viewBox=f"0 0 {width} {height}",
-            elements=elements + [origin],
+    def _back_trace_symbols(self, via_diameter: float, lazy: bool) -> svg.SVG:
+        """
+        Generate the back traces as one trace definition and a <use> per via pair.
+
+        Args:
+            via_diameter: Diameter of the vias in millimeters
+            lazy: Generate the <use> elements only while the document is written
+
+        Returns:
+            An SVG document equivalent to generate_back_traces(via_diameter)
+        """
+        defs = {}
+        symbol_id = self._symbol(
+            defs,
+            "back-trace",
+            (self.pad.key(), via_diameter),
+            lambda: self.pad.generate_back_traces(0, 0, via_diameter=via_diameter),
+        )
+        # Same placement as the expanded traces, whose geometry starts one
+        # pitch to the right of the pad center
+        uses = (
+            svg.Use(
+                href=f"#{symbol_id}",
+                x=-i * self.pad.pitch - self.pad.pitch / 2,
+                y=self.pad.pitch / 2 + j * self.pad.pitch,
+            )
+            for i in range(self.y_count)
+            for j in range(self.x_count)
         )
+        traces = svg.G(
+            transform=[svg.Rotate(-90, 0, 0)], elements=uses if lazy else list(uses)
+        )
+        return self._document([svg.Defs(elements=list(defs.values())), traces, origin])
+
+    def _pad_defs(self) -> Dict[str, svg.Element]:
+        """
+        Define every pad shape the grid uses before any row is generated.
+
+        Returns:
+            The shape definitions by id, in order of first use
+        """
+        defs = {}
+        for connection_type, count in (
+            ("trace", self.y_count + 1),
+            ("via", self.x_count + 1),
+        ):
+            # The first, second and last pads cover all edge types
+            for i in sorted({0, 1, count - 1}):
+                self._pad(i, count, connection_type, defs)
+        return defs
+
+    def _columns(
+        self, defs: Optional[Dict[str, svg.Element]], lazy: bool
+    ) -> Iterator[svg.G]:
+        """
+        Generate the columns of pads connected by traces.
+
+        Args:
+            defs: Pad shape definitions to place with <use>, None to generate
+                every pad in full
+            lazy: Generate each column's pads only while it is written
+
+        Yields:
+            An SVG group for each column, translated into place
+        """
+        for i in range(self.x_count):
+            column = self._row(self.y_count, connection_type="trace", defs=defs, lazy=lazy)
+            column.transform = [svg.Translate(i * self.pad.pitch, 0)]
+            yield column
+
+    def _rows(self, defs: Optional[Dict[str, svg.Element]], lazy: bool) -> Iterator[svg.G]:
+        """
+        Generate the rows of pads connected by vias.
+
+        Args:
+            defs: Pad shape definitions to place with <use>, None to generate
+                every pad in full
+            lazy: Generate each row's pads only while it is written
+
+        Yields:
+            An SVG group for each row, rotated and translated into place
+        """
+        for i in range(self.y_count):
+            row = self._row(self.x_count, connection_type="via", defs=defs, lazy=lazy)
+            row.transform = [
+                svg.Rotate(-90, 0, 0),
+                svg.Translate(
+                    -(i + 1) * self.pad.pitch - self.pad.pitch / 2, self.pad.pitch / 2
+                ),
+            ]
+            yield row
+
+    def _symbol(
+        self, defs: Dict[str, svg.Element], name: str, key: tuple, make: Callable[[], svg.G]
+    ) -> str:
+        """
+        Return the id of a shared shape, defining it on first use.
+
+        Args:
+            defs: Shape definitions of the document being generated, by id
+            name: Readable prefix of the id
+            key: Everything that determines the shape's geometry
+            make: Function generating the shape around the origin
+
+        Returns:
+            The id to reference the shape with in <use>
+        """
+        # Derived from the key so grids with different pads placed in one
+        # document never share an id
+        symbol_id = f"{name}-{hashlib.md5(repr(key).encode()).hexdigest()[:8]}"
+        if symbol_id not in defs:
+            shape = make()
+            shape.id = symbol_id
+            defs[symbol_id] = shape
+        return symbol_id
 
     def _get_edge_type(self, i: int, count: int) -> str:
         """
@@ -444,29 +1041,68 @@ class TouchGrid:
         else:
             return "center"
 
-    def _row(self, count: int, connection_type: str) -> svg.G:
+    def _row(
+        self,
+        count: int,
+        connection_type: str,
+        defs: Optional[Dict[str, svg.Element]] = None,
+        lazy: bool = False,
+    ) -> svg.G:
         """
         Create an SVG element containing a row of connected capacitive touch pads.
 
         Args:
             count: Number of pads in the row
             connection_type: Type of connection between pads ("via" or "trace")
+            defs: Shape definitions to reuse and add to, pads are placed with
+                <use>; None to generate every pad in full
+            lazy: Give the group a generator of pads instead of a list
 
         Returns:
             An SVG group element containing the row of pads with appropriate
             edge and connection types
         """
         count += 1  # +1 since edge pads are ~1/2 pitch
-        elements = [
-            self.pad.generate(
+        pads = (self._pad(i, count, connection_type, defs) for i in range(count))
+        return svg.G(elements=pads if lazy else list(pads))
+
+    def _pad(
+        self,
+        i: int,
+        count: int,
+        connection_type: str,
+        defs: Optional[Dict[str, svg.Element]],
+    ) -> svg.Element:
+        """
+        Create one pad of a row.
+
+        Args:
+            i: Index of the pad in the row
+            count: Total number of pads in the row
+            connection_type: Type of connection between pads ("via" or "trace")
+            defs: Shape definitions to reuse and add to, None to generate the
+                pad in full
+
+        Returns:
+            The pad's SVG group, or a <use> of its shape
+        """
+        edge_type = self._get_edge_type(i, count)
+        if defs is None:
+            return self.pad.generate(
                 self.pad.pitch,
                 i * self.pad.pitch,
                 connection_type=connection_type,
-                edge_type=self._get_edge_type(i, count),
+                edge_type=edge_type,
             )
-            for i in range(count)
-        ]
-        return svg.G(elements=elements)
+        symbol_id = self._symbol(
+            defs,
+            f"pad-{edge_type}-{connection_type}",
+            (self.pad.key(), edge_type, connection_type),
+            lambda: self.pad.generate(
+                0, 0, connection_type=connection_type, edge_type=edge_type
+            ),
+        )
+        return svg.Use(href=f"#{symbol_id}", x=self.pad.pitch, y=i * self.pad.pitch)
 
 
 class FlowerTouchPad(TouchGrid):
@@ -670,8 +1306,8 @@ def write_pcb_50mm():
     )
 
     for fname, pad in [
-        ("touch_pads.svg", flower50mm_6x6.generate()),
-        ("back_traces.svg", flower50mm_6x6.generate_back_traces(via_diameter=0.4)),
+        ("touch_pads.svg", flower50mm_6x6.generate(lazy=True)),
+        ("back_traces.svg", flower50mm_6x6.generate_back_traces(via_diameter=0.4, lazy=True)),
     ]:
         with open(fname, "w") as f:
             image = svg.SVG(
@@ -682,7 +1318,10 @@ def write_pcb_50mm():
                     pad,
                 ],
             )
-            f.write(str(image))
+            write_svg(f, image)
+
+    with open("touch_pads.kicad_mod", "w") as f:
+        flower50mm_6x6.write_kicad_mod(f, "touch_pads_6x6_50mm", via_diameter=0.4)
 
 
 if __name__ == "__main__":
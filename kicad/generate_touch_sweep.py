@@ -0,0 +1,308 @@
+"""
+Generate touch pad grids for every combination of a parameter sweep.
+
+Each variant is generated in a process pool and written as an SVG of the pads
+and one of the back traces (optionally also a KiCad footprint), named after
+its parameters. A manifest.json in the output directory records the
+parameters, a hash of them and the files of every variant. Variants whose
+files exist with a matching hash in the manifest are skipped, so re-running
+a large sweep only generates what changed. The hash includes the generator
+source, so changing the pad geometry regenerates everything.
+
+Parameters are given as comma separated values or start:stop:step ranges
+(stop included), on the command line or as a JSON spec file with the same
+keys.
+
+Usage:
+    pip install svg.py
+    python3 generate_touch_sweep.py --pad flower,diamond --pitch 4:6:0.5 --radius 0.1,0.15
+    python3 generate_touch_sweep.py --spec sweep.json --output sweep --jobs 8
+
+Example spec:
+    {"pad": ["flower"], "pitch": "4:6:0.5", "x_count": [4, 6], "y_count": [4, 6]}
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+from typing import Dict, Iterator, List, Union
+
+import generate_svg_capacitive_touch as touch
+
+GRIDS = {
+    "flower": touch.FlowerTouchPad,
+    "diamond": touch.DiamondTouchPad,
+}
+
+# Sweep parameters, their types and defaults
+PARAMETERS = {
+    "pad": (str, ["flower"]),
+    "pitch": (float, [4.5]),
+    "radius": (float, [0.15]),
+    "separation": (float, [0.2]),
+    "trace_width": (float, [0.16]),
+    "x_count": (int, [4]),
+    "y_count": (int, [4]),
+    "via_diameter": (float, [0.4]),
+}
+
+MANIFEST = "manifest.json"
+
+
+def parse_values(values: Union[str, list], kind: type) -> list:
+    """
+    Parse the values of one sweep parameter.
+
+    Args:
+        values: A list of values, or a string of comma separated values and
+            start:stop:step ranges whose stop is included
+        kind: Type of the values
+
+    Returns:
+        The values, in the order given
+    """
+    if not isinstance(values, str):
+        return [kind(value) for value in values]
+    parsed = []
+    for part in values.split(","):
+        if ":" not in part:
+            parsed.append(kind(part))
+            continue
+        start, stop, step = (kind(v) for v in part.split(":"))
+        if step <= 0:
+            raise ValueError(f"Range step must be positive: {part}")
+        if stop < start:
+            raise ValueError(f"Range stop must not be below its start: {part}")
+        # Counting steps avoids accumulating float error and keeps stop
+        count = int(round((stop - start) / step, 9)) + 1
+        parsed += [kind(round(start + n * step, 9)) for n in range(count)]
+    return parsed
+
+
+def variants(spec: Dict[str, Union[str, list]]) -> Iterator[Dict[str, object]]:
+    """
+    Generate every combination of the sweep's parameter values.
+
+    Args:
+        spec: Values of the sweep parameters by name, missing ones default to
+            the values in PARAMETERS
+
+    Yields:
+        The parameters of each variant
+    """
+    unknown = set(spec) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    names = list(PARAMETERS)
+    values = [
+        parse_values(spec[name], kind) if name in spec else default
+        for name, (kind, default) in PARAMETERS.items()
+    ]
+    for pad in values[0]:
+        if pad not in GRIDS:
+            raise ValueError(f"Unknown pad type {pad!r}, expected one of {', '.join(GRIDS)}")
+    for combination in itertools.product(*values):
+        yield dict(zip(names, combination))
+
+
+def variant_name(params: Dict[str, object]) -> str:
+    """Return the file name stem of a variant."""
+    # repr() is the shortest text that reads back as the same float, so
+    # different parameters never share a name
+    return (
+        f"{params['pad']}_{params['x_count']}x{params['y_count']}"
+        f"_p{params['pitch']!r}_r{params['radius']!r}_s{params['separation']!r}"
+        f"_t{params['trace_width']!r}_v{params['via_diameter']!r}"
+    )
+
+
+def _generator_digest() -> str:
+    with open(touch.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def variant_files(params: Dict[str, object], kicad: bool) -> List[str]:
+    """Return the names of the files written for a variant."""
+    name = variant_name(params)
+    files = [f"{name}.svg", f"{name}_back.svg"]
+    if kicad:
+        files.append(f"{name}.kicad_mod")
+    return files
+
+
+def parameter_hash(params: Dict[str, object], generator: str) -> str:
+    """
+    Hash everything that determines a variant's output.
+
+    Args:
+        params: Parameters of the variant
+        generator: Digest of the generator source
+
+    Returns:
+        Hex digest of the parameters and generator
+    """
+    key = json.dumps({"params": params, "generator": generator}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def generate_variant(params: Dict[str, object], output: str, kicad: bool) -> List[str]:
+    """
+    Generate and write one variant; runs in a worker process.
+
+    Args:
+        params: Parameters of the variant
+        output: Directory to write to
+        kicad: Also write a KiCad footprint
+
+    Returns:
+        Names of the files written, relative to output
+    """
+    grid = GRIDS[params["pad"]](
+        pitch=params["pitch"],
+        radius=params["radius"],
+        separation=params["separation"],
+        trace_width=params["trace_width"],
+        x_count=params["x_count"],
+        y_count=params["y_count"],
+    )
+    via_diameter = params["via_diameter"]
+    writers = [
+        lambda f: touch.write_svg(f, grid.generate(lazy=True)),
+        lambda f: touch.write_svg(
+            f, grid.generate_back_traces(via_diameter=via_diameter, lazy=True)
+        ),
+        lambda f: grid.write_kicad_mod(f, variant_name(params), via_diameter=via_diameter),
+    ]
+    files = variant_files(params, kicad)
+    for fname, write in zip(files, writers):
+        # Write under a temporary name so an interrupted run never leaves a
+        # partial file that looks complete
+        path = os.path.join(output, fname)
+        with open(path + ".tmp", "w") as f:
+            write(f)
+        os.replace(path + ".tmp", path)
+    return files
+
+
+def load_manifest(output: str) -> Dict[str, dict]:
+    """Return the manifest entries of an output directory by variant name."""
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            return {entry["name"]: entry for entry in json.load(f)["variants"]}
+    except FileNotFoundError:
+        return {}
+
+
+def run_sweep(
+    spec: Dict[str, Union[str, list]],
+    output: str,
+    jobs: int = None,
+    kicad: bool = False,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Generate all variants of a sweep that are not up to date.
+
+    Args:
+        spec: Values of the sweep parameters, see variants()
+        output: Directory to write the variants and the manifest to
+        jobs: Worker processes, None for one per CPU
+        kicad: Also write a KiCad footprint of every variant
+        force: Regenerate variants even if they are up to date
+
+    Returns:
+        Counts of the variants that were generated and skipped
+    """
+    os.makedirs(output, exist_ok=True)
+    previous = load_manifest(output)
+    generator = _generator_digest()
+
+    # Variants of other sweeps into the same directory stay in the manifest
+    entries = dict(previous)
+    pending = []
+    skipped = 0
+    swept = {}
+    for params in variants(spec):
+        name = variant_name(params)
+        if name in swept:
+            if swept[name] != params:
+                raise ValueError(f"Variants {swept[name]} and {params} have the same name {name}")
+            # The same value given twice, e.g. by overlapping ranges
+            continue
+        swept[name] = params
+        digest = parameter_hash(params, generator)
+        old = previous.get(name)
+        if (
+            not force
+            and old is not None
+            and old["hash"] == digest
+            and all(
+                fname in old["files"] and os.path.exists(os.path.join(output, fname))
+                for fname in variant_files(params, kicad)
+            )
+        ):
+            skipped += 1
+        else:
+            entries[name] = {"name": name, "hash": digest, "params": params, "files": None}
+            pending.append(name)
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                pool.submit(generate_variant, entries[name]["params"], output, kicad): name
+                for name in pending
+            }
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                entries[name]["files"] = future.result()
+                print(f"Generated {name}")
+    finally:
+        # Record whatever finished, so an interrupted sweep resumes where it stopped
+        manifest = {
+            "generator": generator,
+            "variants": [entry for entry in entries.values() if entry["files"] is not None],
+        }
+        with open(os.path.join(output, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    return {"generated": len(pending), "skipped": skipped}
+
+
+def main():
+    """Parse the sweep from the command line and generate it."""
+    parser = argparse.ArgumentParser(description="Generate touch pad grids for a parameter sweep")
+    parser.add_argument("--spec", metavar="FILE", help="JSON sweep spec, command line values override it")
+    for name, (kind, default) in PARAMETERS.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            dest=name,
+            help=f"Comma separated values or start:stop:step ranges "
+            f"(default: {','.join(str(v) for v in default)})",
+        )
+    parser.add_argument("--output", default="sweep", help="Output directory (default: sweep)")
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--kicad", action="store_true", help="Also write a KiCad footprint per variant")
+    parser.add_argument("--force", action="store_true", help="Regenerate up to date variants too")
+
+    args = parser.parse_args()
+
+    spec = {}
+    if args.spec:
+        with open(args.spec) as f:
+            spec = json.load(f)
+    for name in PARAMETERS:
+        if getattr(args, name) is not None:
+            spec[name] = getattr(args, name)
+
+    counts = run_sweep(spec, args.output, jobs=args.jobs, kicad=args.kicad, force=args.force)
+    print(
+        f"{counts['generated']} variants generated, {counts['skipped']} up to date, "
+        f"manifest written to {os.path.join(args.output, MANIFEST)}"
+    )
+
+
+if __name__ == "__main__":
+    main()